@@ -0,0 +1,85 @@
+import math
+import threading
+import time
+from collections import deque
+
+
+class AdmissionFull(RuntimeError):
+    def __init__(self, retry_after):
+        super().__init__(f"Too busy right now, try again in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class Admission:
+    """Weighted semaphore in front of the upstream providers.
+
+    Requests take `cost` units of `capacity` while they generate. When it is
+    used up they wait in a FIFO queue of at most `max_queue` requests for up to
+    `max_wait` seconds; anything beyond that is turned away straight away with
+    a Retry-After estimated from how long requests have been holding units."""
+
+    def __init__(self, capacity=32, max_queue=64, max_wait=30.0):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_use = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._queue = deque()
+        self._hold = 10.0  # moving average of seconds a request holds its units
+        self._cond = threading.Condition()
+
+    def acquire(self, cost):
+        # returns a release() to call once the request is done
+        cost = min(max(cost, 1), self.capacity)
+        with self._cond:
+            if self._queue or self.in_use + cost > self.capacity:
+                self._wait(cost)
+            self.in_use += cost
+            self.admitted += 1
+        started = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            with self._cond:
+                if released:
+                    return
+                released = True
+                self.in_use -= cost
+                self._hold += (time.monotonic() - started - self._hold) * 0.2
+                self._cond.notify_all()
+
+        return release
+
+    def _wait(self, cost):
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionFull(self._retry_after())
+        ticket = object()
+        self._queue.append(ticket)
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while self._queue[0] is not ticket or self.in_use + cost > self.capacity:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise AdmissionFull(self._retry_after())
+                self._cond.wait(remaining)
+        finally:
+            self._queue.remove(ticket)
+            self._cond.notify_all()  # the next in line may fit now
+
+    def _retry_after(self):
+        # about how long until the queue ahead has drained through `capacity`
+        return max(1, math.ceil(self._hold * (len(self._queue) + 1) / self.capacity))
+
+    def stats(self):
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "in_use": self.in_use,
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
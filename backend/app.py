@@ -1,382 +1,839 @@
-import json
+import base64
+import functools
+import logging
+import math
 import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Flask, Response, abort, g, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from limits import parse_many
 
 app = Flask(__name__)
 CORS(app)
 app.config["CORS_HEADERS"] = "Content-Type"
-# limiter = Limiter(
-#     get_remote_address,
-#     app=app,
-#     default_limits=["2 per minute"],
-#     storage_uri="memory://",
-# )
 
 
 from openai import OpenAI
 
+import budget
+import prompts
+from admission import Admission, AdmissionFull
+from assets import AssetStore
+from batch import run_batch, unique_ideas
+from cache import ResponseCache, cache_key, etag_for, normalize_idea
+from extract import JsonExtractor
+from httpcache import Compressor, matching_etag
+from jobs import JobQueue
+from logs import log, log_payload, request_id, setup_logging, submit
+from metrics import Metrics
+from similar import IdeaIndex
+from singleflight import SingleFlight
+from streaming import ndjson_stream, stream_section, wants_stream
+from transport import CircuitBreaker, CircuitOpenError, Upstream, http_client, request_timeout
+
 load_dotenv()  # get api key from .env
 PERPLEXITY_API_KEY = os.environ.get("PERPLEXITY_API_KEY")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-client = OpenAI(api_key=PERPLEXITY_API_KEY, base_url="https://api.perplexity.ai")
-imageClient = OpenAI(api_key=OPENAI_API_KEY)
+
+# one json line per event, written to stdout by a background thread so requests never
+# wait on it. prompts and model output are logged for LOG_PAYLOAD_SAMPLE of generations,
+# cut to LOG_MAX_FIELD characters; LOG_PROMPTS=1 logs all of them in full for debugging
+logHandler = setup_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    max_field=int(os.environ.get("LOG_MAX_FIELD", "500")),
+    payload_sample=float(os.environ.get("LOG_PAYLOAD_SAMPLE", "0.01")),
+    prompts=os.environ.get("LOG_PROMPTS") == "1",
+)
+
+# upstream transport: pooled keep-alive connections, explicit timeouts, and our own
+# retry/backoff + circuit breaker (the sdk's built-in retries are turned off)
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.environ.get("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.environ.get("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", "120"))
+UPSTREAM_MAX_RETRIES = int(os.environ.get("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_BACKOFF_BASE = float(os.environ.get("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.environ.get("UPSTREAM_BACKOFF_MAX", "8"))
+UPSTREAM_MAX_RETRY_AFTER = float(os.environ.get("UPSTREAM_MAX_RETRY_AFTER", "30"))
+BREAKER_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", "30"))
+# READ_TIMEOUT_MARKET, READ_TIMEOUT_PRICING, ... override the read timeout per endpoint
+READ_TIMEOUTS = {
+    endpoint: float(os.environ.get(f"READ_TIMEOUT_{endpoint.upper()}", UPSTREAM_READ_TIMEOUT))
+    for endpoint in ("market", "outreach", "pricing", "branding_text")
+}
+
+# prometheus metrics for /metrics; every worker writes its numbers to METRICS_DIR
+# and whichever worker gets scraped adds them up
+metrics = Metrics(
+    directory=os.environ.get(
+        "METRICS_DIR", os.path.join(tempfile.gettempdir(), "launchpad", "metrics")
+    ),
+    interval=float(os.environ.get("METRICS_INTERVAL", "5")),
+)
+metrics.histogram("launchpad_request_seconds", "Time until a route's response was ready (headers only for streams).")
+metrics.gauge("launchpad_requests_in_flight", "Requests being handled right now.")
+metrics.histogram("launchpad_upstream_seconds", "Time per upstream call attempt by provider and model (time to first byte for streams).")
+metrics.histogram("launchpad_generation_seconds", "Time to generate and parse one section that missed the cache.")
+metrics.counter("launchpad_tokens_total", "Prompt and completion tokens reported in response.usage.")
+metrics.counter("launchpad_images_total", "Images generated.")
+metrics.counter("launchpad_cost_dollars_total", "Estimated upstream spend at list prices.")
+metrics.counter("launchpad_json_parse_total", "Model outputs by how they were parsed (failed = thrown away).")
+metrics.counter("launchpad_cache_lookups_total", "Response cache lookups by result.")
+metrics.counter("launchpad_singleflight_total", "Generations started (leader) or shared with one already running (follower).")
+metrics.gauge("launchpad_singleflight_in_flight", "Generations currently running.")
+metrics.gauge("launchpad_circuit_open", "1 while a provider's circuit breaker is open in a worker.")
+metrics.counter("launchpad_rejected_total", "Requests turned away with a 429, by reason.")
+metrics.gauge("launchpad_admission_in_use", "Upstream capacity units taken by running generations.")
+metrics.gauge("launchpad_admission_queued", "Requests waiting for upstream capacity.")
+metrics.gauge("launchpad_idea_index_size", "Answered ideas in the near-duplicate index.")
+metrics.counter("launchpad_log_dropped_total", "Log lines dropped because the log writer fell behind.")
+
+# list prices in dollars: per million (prompt, completion) tokens, per image by size
+TOKEN_PRICES = {"sonar-pro": (3.0, 15.0), "sonar": (1.0, 1.0)}
+IMAGE_PRICES = {"1024x1024": 0.04, "1792x1024": 0.08}
+
+
+def observe_upstream(provider, model, seconds, outcome):
+    metrics.observe(
+        "launchpad_upstream_seconds", seconds, provider=provider, model=model, outcome=outcome
+    )
+
+
+def record_usage(endpoint, model, usage):
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    metrics.inc("launchpad_tokens_total", prompt_tokens, endpoint=endpoint, model=model, kind="prompt")
+    metrics.inc("launchpad_tokens_total", completion_tokens, endpoint=endpoint, model=model, kind="completion")
+    prompt_price, completion_price = TOKEN_PRICES.get(model, (0.0, 0.0))
+    cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+    metrics.inc("launchpad_cost_dollars_total", cost, endpoint=endpoint, model=model)
+
+
+def upstream(name):
+    return Upstream(
+        name,
+        max_retries=UPSTREAM_MAX_RETRIES,
+        base_delay=UPSTREAM_BACKOFF_BASE,
+        max_delay=UPSTREAM_BACKOFF_MAX,
+        max_retry_after=UPSTREAM_MAX_RETRY_AFTER,
+        breaker=CircuitBreaker(name, BREAKER_THRESHOLD, BREAKER_COOLDOWN),
+        observe=observe_upstream,
+    )
+
+
+def pooled_client(**kwargs):
+    return OpenAI(
+        max_retries=0,
+        http_client=http_client(
+            UPSTREAM_MAX_CONNECTIONS, UPSTREAM_MAX_KEEPALIVE, UPSTREAM_KEEPALIVE_EXPIRY
+        ),
+        **kwargs,
+    )
+
+
+# the base urls can point at fakeupstream.py for load tests
+client = pooled_client(
+    api_key=PERPLEXITY_API_KEY,
+    base_url=os.environ.get("PERPLEXITY_BASE_URL", "https://api.perplexity.ai"),
+)
+imageClient = pooled_client(
+    api_key=OPENAI_API_KEY, base_url=os.environ.get("OPENAI_BASE_URL") or None
+)
+sonarUpstream = upstream("perplexity")
+imageUpstream = upstream("openai")
+
+# repeat lookups for the same idea are answered from here instead of sonar-pro. The
+# SQLite file is shared by all workers; RESPONSE_CACHE_PATH= (empty) keeps it in memory
+responseCache = ResponseCache(
+    max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL", str(24 * 60 * 60))),
+    path=os.environ.get(
+        "RESPONSE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "launchpad", "responses.db")
+    )
+    or None,
+)
+
+# with SIMILAR_IDEAS=1, rewordings of an idea we've already answered ("coffee shop
+# selling honey coffee!") get that answer back marked with similar_to. Off by
+# default: the dashboard doesn't show similar_to, so a bad match would pass for
+# an answer to the user's own idea
+SERVE_SIMILAR = os.environ.get("SIMILAR_IDEAS", "0") == "1"
+ideaIndex = None
+if SERVE_SIMILAR:
+    ideaIndex = IdeaIndex(
+        threshold=float(os.environ.get("SIMILARITY_THRESHOLD", "0.8")),
+        # how many stored ideas must use a word before two ideas may differ in it
+        min_common=int(os.environ.get("SIMILAR_MIN_COMMON", "5")),
+        path=os.environ.get(
+            "IDEA_INDEX_PATH", os.path.join(tempfile.gettempdir(), "launchpad", "ideas.json")
+        ),
+        interval=float(os.environ.get("IDEA_INDEX_SNAPSHOT_INTERVAL", "300")),
+    )
+
+# identical requests that arrive while one is still generating wait for it
+# instead of starting their own upstream call. Across workers that only pays off
+# when the waiting worker can then read the answer from the shared SQLite cache
+inflight = SingleFlight(
+    lock_dir=os.environ.get(
+        "SINGLEFLIGHT_DIR", os.path.join(tempfile.gettempdir(), "launchpad-inflight")
+    )
+    if responseCache.path
+    else None
+)
+
+# bump an endpoint's version whenever its prompt changes so old answers aren't reused
+# (the text prompts are versioned next to their templates in prompts.py)
+PROMPT_VERSIONS = {**prompts.VERSIONS, "branding_images": 2}
+
+
+def section_key(endpoint, idea):
+    model = "dall-e-3" if endpoint == "branding_images" else "sonar-pro"
+    return cache_key(endpoint, PROMPT_VERSIONS[endpoint], model, idea)
+
+
+def is_cached(endpoint, idea):
+    return responseCache.peek(section_key(endpoint, idea)) is not None
+
+
+def remember_idea(idea):
+    if ideaIndex is not None:
+        ideaIndex.add(idea)
+
+
+def find_similar(endpoint, idea):
+    # (similar_to marker, cached answer) for the closest answered rewording, or None
+    if not SERVE_SIMILAR:
+        return None
+    for match, similarity in ideaIndex.similar(idea):
+        if normalize_idea(match) == normalize_idea(idea):
+            continue  # the exact key, which just missed
+        cached = responseCache.peek(section_key(endpoint, match))
+        if cached is not None:
+            metrics.inc("launchpad_cache_lookups_total", result="similar_hit")
+            return {"idea": match, "similarity": round(similarity, 3)}, cached
+    return None
+
+
+# estimated prompt tokens per request next to what the provider actually billed
+tokenStats = prompts.TokenStats()
+
+
+# what each endpoint's JSON has to contain for the dashboard tabs to render it
+RESPONSE_SCHEMAS = {
+    "market": {
+        "MarketSize": dict,
+        "MarketSizeGrowingYOYPercent": dict,
+        "CustomerSegments": list,
+        "GeographicDistribution": list,
+        "MarketTrends": list,
+        "CompetitiveLandscape": list,
+        "SWOT": dict,
+    },
+    "outreach": {"Emails": dict, "Calls": dict},
+    "pricing": {
+        "selected_pricing_model": str,
+        "pricing_tiers": dict,
+        "competitor_analysis": list,
+        "key_insights": list,
+        "financial_projection": dict,
+        "optimization_opportunities": list,
+    },
+    "branding_text": {
+        "brand_identity": {"colors": dict, "tagline": str, "social_media_posts": dict}
+    },
+}
+
+# malformed output is repaired locally first; only if that fails do we pay for
+# one (cheaper, no search) call asking the model to fix its own JSON
+REPAIR_MODEL = os.environ.get("REPAIR_MODEL", "sonar")
+jsonExtractor = JsonExtractor()
+
+
+def repair_with_model(raw_out, problems):
+    log("json_repair", level=logging.WARNING, problems="; ".join(problems))
+    response = sonarUpstream.call(
+        client.chat.completions.create,
+        timeout=request_timeout(UPSTREAM_READ_TIMEOUT, UPSTREAM_CONNECT_TIMEOUT),
+        model=REPAIR_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": "You fix malformed JSON. Reply with only the corrected JSON "
+                "object, keeping all of the original content.",
+            },
+            {
+                "role": "user",
+                "content": f"Problems: {'; '.join(problems)}\n\n{raw_out}",
+            },
+        ],
+    )
+    record_usage("repair", REPAIR_MODEL, response.usage)
+    return response.choices[0].message.content
+
+
+def ask_sonar(endpoint, idea, on_token=None, fields=None):
+    # on_token gets each piece of text as it streams in; cache hits and requests
+    # coalesced onto another caller's generation just get the final result.
+    # fields() returns extra template fields and only runs on a cache miss
+    key = section_key(endpoint, idea)
+    cached = responseCache.get(key)
+    if cached is not None:
+        return cached
+    similar = find_similar(endpoint, idea)
+    if similar is not None:
+        similar_to, cached = similar
+        return {**cached, "similar_to": similar_to}
+
+    return inflight.do(
+        key,
+        lambda: _ask_sonar(endpoint, key, idea, on_token, fields),
+        recheck=lambda: responseCache.peek(key),
+    )
+
+
+def _ask_sonar(endpoint, key, idea, on_token=None, fields=None):
+    started = time.perf_counter()
+    messages = prompts.messages(endpoint, idea, **(fields() if fields else {}))
+    estimated_tokens = prompts.count_tokens(messages)
+    log_payload("prompt", messages, endpoint=endpoint)
+    usage = None
+
+    timeout = request_timeout(READ_TIMEOUTS[endpoint], UPSTREAM_CONNECT_TIMEOUT)
+    if on_token is None:
+        response = sonarUpstream.call(
+            client.chat.completions.create,
+            model="sonar-pro",
+            messages=messages,
+            timeout=timeout,
+        )
+        raw_out = response.choices[0].message.content
+        usage = response.usage
+    else:
+        pieces = []
+        for chunk in sonarUpstream.call(
+            client.chat.completions.create,
+            model="sonar-pro",
+            messages=messages,
+            stream=True,
+            timeout=timeout,
+        ):
+            usage = getattr(chunk, "usage", None) or usage
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                pieces.append(text)
+                on_token(text)
+        raw_out = "".join(pieces)
+    log_payload("model_output", raw_out, endpoint=endpoint)
+    tokenStats.record(endpoint, estimated_tokens, usage)
+    record_usage(endpoint, "sonar-pro", usage)
+
+    json_out = jsonExtractor.parse(
+        raw_out, RESPONSE_SCHEMAS[endpoint], repair=repair_with_model
+    )
+    responseCache.set(key, json_out)
+    remember_idea(idea)
+    seconds = time.perf_counter() - started
+    metrics.observe("launchpad_generation_seconds", seconds, endpoint=endpoint)
+    log(
+        "generation",
+        endpoint=endpoint,
+        idea=idea,
+        seconds=round(seconds, 3),
+        estimated_tokens=estimated_tokens,
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+    )
+    return json_out
+
+
+# dall-e calls are slow, so the branding images are generated side by side
+# by default enough threads for the 4 images of every branding request admission lets
+# generate at once (8 capacity units each); IMAGE_TIMEOUT counts from when an image
+# starts, and one still queued after IMAGE_QUEUE_TIMEOUT is given up on
+IMAGE_CONCURRENCY = int(
+    os.environ.get(
+        "IMAGE_CONCURRENCY", str(max(4, int(os.environ.get("ADMISSION_CAPACITY", "32")) // 8 * 4))
+    )
+)
+IMAGE_TIMEOUT = float(os.environ.get("IMAGE_TIMEOUT", "90"))
+IMAGE_QUEUE_TIMEOUT = float(os.environ.get("IMAGE_QUEUE_TIMEOUT", "60"))
+imageExecutor = ThreadPoolExecutor(
+    max_workers=IMAGE_CONCURRENCY, thread_name_prefix="dalle"
+)
+
+# generated images are kept on our own disk (dall-e urls expire after an hour) and
+# served from /assets with smaller webp/jpeg copies and thumbnails. They're deleted
+# after ASSET_TTL, which has to outlast the cached answers and jobs linking to them
+assetStore = AssetStore(
+    os.environ.get(
+        "ASSET_DIR", os.path.join(tempfile.gettempdir(), "launchpad", "assets")
+    ),
+    thumb_size=int(os.environ.get("ASSET_THUMB_SIZE", "512")),
+    ttl=float(
+        os.environ.get(
+            "ASSET_TTL",
+            str(max(responseCache.ttl, float(os.environ.get("JOB_TTL", str(24 * 60 * 60)))) + 60 * 60),
+        )
+    ),
+)
+# public origin of /assets links, e.g. a cdn in front of us; defaults to the host
+# the request came in on
+ASSET_BASE_URL = os.environ.get("ASSET_BASE_URL", "").rstrip("/")
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def generate_image(prompt, size):
+    # returns variant -> /assets path, e.g. {"png": ..., "webp": ..., "thumb": ...}
+    image = imageUpstream.call(
+        imageClient.images.generate,
+        model="dall-e-3",
+        prompt=prompt,
+        size=size,
+        quality="standard",
+        response_format="b64_json",
+        n=1,
+        timeout=request_timeout(IMAGE_TIMEOUT, UPSTREAM_CONNECT_TIMEOUT),
+    )
+    metrics.inc("launchpad_images_total", model="dall-e-3", size=size)
+    metrics.inc(
+        "launchpad_cost_dollars_total",
+        IMAGE_PRICES.get(size, 0.0),
+        endpoint="branding_images",
+        model="dall-e-3",
+    )
+    names = assetStore.put(base64.b64decode(image.data[0].b64_json))
+    return {variant: f"/assets/{name}" for variant, name in names.items()}
+
+
+def asset_urls(value):
+    # turns the /assets paths we cache into links for the current request
+    if isinstance(value, dict):
+        return {key: asset_urls(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [asset_urls(item) for item in value]
+    if isinstance(value, str) and value.startswith("/assets/"):
+        return (ASSET_BASE_URL or request.host_url.rstrip("/")) + value
+    return value
+
+
+def generate_images(assets):
+    # assets maps name -> (prompt, size); returns (name -> variants or None, name -> error)
+    queued_at = time.monotonic()
+    started = {}  # name -> when a thread picked it up
+
+    def run(name, prompt, size):
+        started[name] = time.monotonic()
+        return generate_image(prompt, size)
+
+    futures = {
+        name: submit(imageExecutor, run, name, prompt, size)
+        for name, (prompt, size) in assets.items()
+    }
+
+    def deadline(name):
+        if name in started:
+            return started[name] + IMAGE_TIMEOUT
+        return queued_at + IMAGE_QUEUE_TIMEOUT
+
+    images, errors = {}, {}
+    pending = dict(futures)
+    while pending:
+        remaining = min(deadline(name) for name in pending) - time.monotonic()
+        if remaining > 0:
+            # at most a second at a time: nothing wakes us when a queued image
+            # starts and its (usually earlier) running deadline takes over
+            wait(pending.values(), timeout=min(remaining, 1.0), return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        for name, future in list(pending.items()):
+            if future.done():
+                del pending[name]
+            elif deadline(name) <= now:
+                if future.cancel():  # never started: the pool is busy with other requests
+                    errors[name] = f"image queue full, not started after {IMAGE_QUEUE_TIMEOUT:g}s"
+                elif name in started:
+                    errors[name] = f"timed out after {IMAGE_TIMEOUT:g}s"
+                else:
+                    continue  # started just now; its own deadline applies next round
+                del pending[name]
+
+    for name, future in futures.items():
+        images[name] = None
+        if name in errors:
+            continue
+        if future.exception() is not None:
+            errors[name] = str(future.exception())
+        else:
+            images[name] = future.result()
+    return images, errors
+
+
+def error_response(e):
+    log("request_failed", level=logging.WARNING, error=str(e), type=type(e).__name__)
+    if isinstance(e, CircuitOpenError):
+        # the provider is struggling, tell the client when to come back
+        return (
+            jsonify({"error": str(e)}),
+            503,
+            {"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    return jsonify({"error": str(e)}), 500
+
+
+# what a request costs against the rate limits and upstream capacity, roughly in
+# sonar-pro calls: pricing also reads the market research, images are 4 dall-e calls
+SECTION_COSTS = {
+    "market": 1,
+    "outreach": 1,
+    "pricing": 2,
+    "branding_text": 1,
+    "branding_images": 8,
+}
+
+# per-client and global limits in those units. memory:// counts per worker; point
+# RATELIMIT_STORAGE_URI at redis (redis://host:6379) to count across all of them
+limiter = Limiter(
+    get_remote_address,
+    app=app,
+    storage_uri=os.environ.get("RATELIMIT_STORAGE_URI", "memory://"),
+    swallow_errors=True,  # a storage outage shouldn't take the api down with it
+    in_memory_fallback_enabled=True,
+)
+CLIENT_RATE_LIMIT = os.environ.get("CLIENT_RATE_LIMIT", "40 per minute;300 per hour")
+GLOBAL_RATE_LIMIT = os.environ.get("GLOBAL_RATE_LIMIT", "600 per minute")
+
+# how many cost units may generate at once in this worker (keep workers x capacity
+# near what the providers handle without 429s) and how many requests may queue
+admission = Admission(
+    capacity=int(os.environ.get("ADMISSION_CAPACITY", "32")),
+    max_queue=int(os.environ.get("ADMISSION_QUEUE", "64")),
+    max_wait=float(os.environ.get("ADMISSION_MAX_WAIT", "30")),
+)
+
+
+def request_idea():
+    # ?idea= on GET, so browsers can cache and revalidate the answer; {"idea": ...} on POST
+    if request.method in ("GET", "HEAD"):
+        return request.args.get("idea")
+    return (request.get_json(silent=True) or {}).get("idea")
+
+
+def requested_sections(data, default):
+    # the body's "sections", or None when it isn't a list of names ("market" would
+    # otherwise be read as the sections m, a, r, ...)
+    sections = data.get("sections") or default
+    if not isinstance(sections, list) or not all(isinstance(name, str) for name in sections):
+        return None
+    return sections
+
+
+def request_cost(endpoint):
+    # cost of the sections this request would generate; 0 when they're all cached
+    if "cost" not in g:
+        idea = request_idea()
+        sections = [endpoint]
+        if endpoint == "report":
+            requested = requested_sections(request.get_json(silent=True) or {}, list(REPORT_SECTIONS))
+            sections = [name for name in requested or [] if name in SECTION_COSTS]
+        g.cost = sum(
+            SECTION_COSTS[name]
+            for name in sections
+            if not isinstance(idea, str) or not is_cached(name, idea)
+        )
+    return g.cost
+
+
+clientLimits = parse_many(CLIENT_RATE_LIMIT)
+globalLimits = parse_many(GLOBAL_RATE_LIMIT)
+# the most one request (or batch section) can cost without always being turned away
+LIMIT_UNITS = min(item.amount for item in clientLimits + globalLimits)
+
+
+def charge_limits(client, cost):
+    # takes cost from a client's budget and the global limit outside of a request
+    # (batch sections), sleeping until the windows have room instead of failing
+    buckets = [(item, client, "client") for item in clientLimits]
+    buckets += [(item, "global", "global") for item in globalLimits]
+    while True:
+        try:
+            full = [bucket for bucket in buckets if not limiter.limiter.test(*bucket, cost=cost)]
+            if not full:
+                for bucket in buckets:
+                    limiter.limiter.hit(*bucket, cost=cost)
+                return
+            reset = max(limiter.limiter.get_window_stats(*bucket).reset_time for bucket in full)
+        except Exception as e:  # storage outage, let it through like swallow_errors
+            log("rate_limit_storage_failed", level=logging.ERROR, error=str(e))
+            return
+        time.sleep(min(max(reset - time.time(), 1), 60))
+
+
+def rate_limited(limit):
+    metrics.inc("launchpad_rejected_total", reason="rate_limit")
+
+
+def limited(endpoint, admit=True):
+    # cost weighted per-client and global rate limits, then a slot in the admission
+    # queue while generating; requests the cache can answer skip all of it
+    def cost():
+        return request_cost(endpoint)
+
+    def cached():
+        return request_cost(endpoint) == 0
+
+    def decorator(view):
+        @functools.wraps(view)
+        def admitted(*args, **kwargs):
+            if not admit or cached():
+                return view(*args, **kwargs)
+            try:
+                release = admission.acquire(cost())
+            except AdmissionFull as e:
+                metrics.inc("launchpad_rejected_total", reason="queue_full")
+                return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except BaseException:
+                release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(release)  # held until the stream ends
+            else:
+                release()
+            return response
+
+        # one bucket per client across every route, so the limit is a budget in
+        # cost units rather than CLIENT_RATE_LIMIT on each route separately
+        admitted = limiter.shared_limit(
+            CLIENT_RATE_LIMIT,
+            scope="client",
+            cost=cost,
+            exempt_when=cached,
+            on_breach=rate_limited,
+        )(admitted)
+        return limiter.shared_limit(
+            GLOBAL_RATE_LIMIT,
+            scope="global",
+            key_func=lambda: "global",
+            cost=cost,
+            exempt_when=cached,
+            on_breach=rate_limited,
+        )(admitted)
+
+    return decorator
+
+
+# how long browsers may reuse an answer before revalidating it with its etag;
+# CACHE_CONTROL_MARKET, CACHE_CONTROL_PRICING, ... override it per endpoint
+CACHE_CONTROL = os.environ.get("CACHE_CONTROL", "private, max-age=3600")
+CACHE_CONTROLS = {
+    endpoint: os.environ.get(f"CACHE_CONTROL_{endpoint.upper()}", CACHE_CONTROL)
+    for endpoint in ("market", "outreach", "pricing", "branding_text")
+}
+
+
+def cacheable(endpoint):
+    # strong etag (hash of the json body) and Cache-Control on answers. A GET whose
+    # If-None-Match already has the cached answer's etag gets a 304 before any
+    # rate limiting, admission or generation
+    def decorator(view):
+        @functools.wraps(view)
+        def conditional(*args, **kwargs):
+            idea = request_idea()
+            if request.method in ("GET", "HEAD") and request.if_none_match and isinstance(idea, str) and idea:
+                etag = responseCache.etag(section_key(endpoint, idea))
+                tag = etag and matching_etag(request.if_none_match, etag)
+                if tag:
+                    response = Response(status=304)
+                    response.set_etag(tag)
+                    response.vary.add("Accept-Encoding")
+                    response.headers["Cache-Control"] = CACHE_CONTROLS[endpoint]
+                    return response
+
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response.set_etag(etag_for(response.get_data()))
+                response.headers["Cache-Control"] = CACHE_CONTROLS[endpoint]
+            return response
+
+        return conditional
+
+    return decorator
+
+
+@app.errorhandler(429)
+def too_many_requests(e):
+    limit = limiter.current_limit
+    retry_after = max(1, math.ceil(limit.reset_at - time.time())) if limit else 60
+    return (
+        jsonify({"error": f"Rate limit exceeded ({e.description})"}),
+        429,
+        {"Retry-After": str(retry_after)},
+    )
+
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+    # a caller's (or proxy's) X-Request-ID is kept so its logs line up with ours
+    g.request_id = request.headers.get("X-Request-ID", "")[:64] or uuid.uuid4().hex
+    request_id.set(g.request_id)
+    metrics.inc("launchpad_requests_in_flight")
+
+
+# gzip (or brotli, when installed) for json bodies of COMPRESS_MIN_SIZE bytes or more
+compressor = Compressor(min_size=int(os.environ.get("COMPRESS_MIN_SIZE", "1024")))
+
+
+@app.after_request
+def compress_response(response):
+    return compressor(response, request.accept_encodings)
+
+
+@app.after_request
+def record_request(response):
+    # label by the route pattern (/jobs/<job_id>) so ids don't become series
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    seconds = time.perf_counter() - g.started
+    metrics.observe(
+        "launchpad_request_seconds",
+        seconds,
+        route=route,
+        method=request.method,
+        status=response.status_code,
+    )
+    if route != "/metrics":
+        log(
+            "request",
+            method=request.method,
+            route=route,
+            status=response.status_code,
+            seconds=round(seconds, 3),
+            streamed=response.is_streamed,
+        )
+    response.headers["X-Request-ID"] = g.request_id
+    return response
+
+
+@app.teardown_request
+def finish_request(error=None):
+    metrics.inc("launchpad_requests_in_flight", -1)
+    request_id.set(None)  # the thread goes back to the pool
 
 
-# @limiter.exempt
 @app.route("/")
 def index():
     return "HackKnight go!!! sike this is the backend that nobody cares about ^-^"
 
 
-@app.route("/market", methods=["POST"])
+def research_market(idea, on_token=None):
+    return ask_sonar("market", idea, on_token)
+
+
+@app.route("/market", methods=["GET", "POST"])
+@cacheable("market")
+@limited("market")
 def market_research():
-    data = request.json
-    idea = data.get("idea")
+    idea = request_idea()
 
     if not idea:
         return jsonify({"error": "Do you not have any ideas?"}), 400
 
-    print("Idea: ", idea)
-
-    prompt = f"""These are all your qualifications, 
-    You are a Market Research Analyst. 
-    Your task is to tell me the estimated market size for my {idea} in my target market. Using available data, 
-    make reasonable assumptions about the total addressable market (TAM), serviceable available market (SAM), and 
-    serviceable obtainable market (SOM) of my product/service.
-
-    
-    You are a Trend Forecaster. 
-    Your task is to tell me about any current and emerging market trends for my {idea}. 
-    Using industry reports, news articles, and social media conversations, identify at least 3 to 5 
-    trends relevant to my market. Each trend should include its characteristics, potential impact on my business,
-    and examples of companies already practicing this trend.
-
-    You are a Business Analyst. Your task is to conduct a SWOT analysis for my {idea} in my target market. 
-    Identify the Strengths, Weaknesses, Opportunities, and Threats for my product/service. 
-    The analysis should be in a standard SWOT matrix format, with bullet points for each section.
-
-    You are a Market Research Analyst. Your task is to analyze the competitive landscape for my {idea}
-    in my target market. Tell me about the top 5 competitors in my target market, including their market share, 
-    strengths/weaknesses, pricing strategies, and marketing tactics. Present the information in a table format. 
-
-    Now using all the information you've collected, return this information in JSON format.
-    ONLY RETURN IN CORRECT JSON FORMAT, INCLUDE NO OTHER TEXT AND NO EXPLANATION. DO NOT PUT INTO MARKDOWN. DO NOT INCLUDE NEWLINES. DO NOT RETURN COMMENTS.
-
-    Example (sample format, adjust data as needed): 
-    {{
-        "MarketSize": {{
-            "TAM": "4B",
-            "SAM": "3B",
-            "SOM": "500M",
-        }},
-        "MarketSizeGrowingYOYPercent": {{
-            "TAM": 20,
-            "SAM": 12,
-            "SOM": 5,
-        }}
-        "CustomerSegments": [
-            {{"Name": "Small businesses", "Percent": 42}},
-            {{"Name": "Enterprise", "Percent": 28}},
-            {{"Name": "Consumers", "Percent": 30}},
-        ],
-        "GeographicDistribution": [
-            {{"region": "North America", "Percent": 55}}
-            {{"region": "Europe", "Percent": 25}}
-            {{"region": "Asia Pacific", "Percent": 20}}
-        ],
-        "MarketTrends": [
-            "Increasing demand for digital solutions",
-            "Shift towards subscription-based models",
-            "Growing focus on sustainability",
-            "Integration of AI and automation"
-        ],
-        "CompetitiveLandscape": [
-            {{"CompetitorName": "Competitor A", "MarketSharePercent": 40, "Strengths": "Brand recognition, global presence",
-			"Weaknesses": "Perceived as commercial, less personalized"}},
-            {{"CompetitorName": "Competitor B", "MarketSharePercent": 20, "Strengths": "Brand recognition, global presence",
-			"Weaknesses": "Perceived as commercial, less personalized"}},
-            {{"CompetitorName": "Competitor C", "MarketSharePercent": 15, "Strengths": "Brand recognition, global presence",
-			"Weaknesses": "Perceived as commercial, less personalized"}},
-            {{"CompetitorName": "Your position", "MarketSharePercent": 10, "Strengths": "Brand recognition, global presence",
-			"Weaknesses": "Perceived as commercial, less personalized"}}, // THIS IS RESERVED TO COMPARE COMPETITORS WITH OUR STARTUP
-        ],
-        "SWOT": {{
-            "Strengths": [
-                "Innovative product offering",
-                "Strong founding team expertise",
-                "Low overhead costs",
-                "Agility and adaptability"
-            ],
-            "Weaknesses": [
-                "Limited initial resources",
-                "Brand awareness challenges",
-                "Unproven business model",
-                "Small customer base"
-            ],
-            "Opportunities": [
-                "Expanding market size",
-                "Strategic partnerships",
-                "International expansion",
-                "New feature development"
-            ],
-            "Threats": [
-                "Established competitors",
-                "Changing regulations",
-                "Economic downturns",
-                "Rapid technological changes"
-            ],
-        }}
-    }}
-{idea}
-"""
-
-    messages = [
-        {
-            "role": "system",
-            "content": "You are an artificial intelligence assistant and you need to "
-            "engage in a helpful, detailed, polite conversation with a user.",
-        },
-        {
-            "role": "user",
-            "content": prompt,
-        },
-    ]
-
-    print("payload", prompt)
-
-    # won't load until query completes
-    try:
-        print("Starting research...")
-        response = client.chat.completions.create(
-            model="sonar-pro",
-            messages=messages,
-        )
-        print("Research complete.")
-        raw_out = response.choices[0].message.content
-        print("ai output", raw_out)
+    stream = wants_stream()
+    if stream:
+        return stream_section(research_market, idea, stream)
 
-        json_out = json.loads(raw_out)
+    # won't load until query completes (or comes straight from the cache)
+    try:
+        json_out = research_market(idea)
         return jsonify(json_out), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/outreach", methods=["POST"])
+def write_outreach(idea, on_token=None):
+    return ask_sonar("outreach", idea, on_token)
+
+
+@app.route("/outreach", methods=["GET", "POST"])
+@cacheable("outreach")
+@limited("outreach")
 def outreach():
-    data = request.json
-    idea = data.get("idea")
+    idea = request_idea()
 
     if not idea:
         return jsonify({"error": "Do you not have any ideas?"}), 400
 
-    prompt = f"""
-        As a seasoned copywriter who specializes in website copy for a company which is {idea} , your task is to write email templates for cold outreach 
-        and warm leads/referrals. Additionally you will write out the Cold Calling Script guide for initial phone conversations
-        this will include an Introduction, what to say if they show interest, a call to action and objection handling. Additionally
-        you will create a follow up email template. These emails generally should make reference to relevant market information.
-
-        Return all this info in ONLY JSON FORMAT. ONLY RETURN IN CORRECT JSON FORMAT, INCLUDE NO OTHER TEXT AND NO EXPLANATION. 
-        DO NOT PUT INTO MARKDOWN. DO NOT INCLUDE NEWLINES. DO NOT RETURN COMMENTS.
-
-        Example (sample, adjust values when necessary):
-        {{
-            "Emails": {{
-                "ColdEmailTemplate" : "Subject: Solve Your Coffee Challenges with CoffeeHub\n\nDear [Recipient Name],\n\nI hope this email finds you well. My name is [Your Name] from fdhsfhHub, and I'm reaching out because I noticed that [Company Name] might be facing challenges with fdhsfh.\n\nAt fdhsfhHub, we've developed a solution that helps businesses like yours:\n• [Benefit 1]\n• [Benefit 2]\n• [Benefit 3]\n\nWe've already helped companies like [Reference Company] achieve [specific result], and I'd love to show you how we could do the same for [Company Name].\n\nWould you be available for a quick 15-minute call next week to discuss how fdhsfhHub could help your team? I'm free on [Date/Time] or [Date/Time].\n\nLooking forward to connecting,\n\n[Your Name]\n[Your Title]\nfdhsfhHub\n[Phone Number]\n[Email]",
-                "IntroductionEmail" : "Subject: Following Up on [Referrer]'s Introduction\n\nDear [Recipient Name],\n\nI hope this email finds you well. [Referrer Name] suggested I reach out to you regarding the coffee challenges your team might be facing.\n\nAt coffeeHub, we specialize in helping businesses like yours overcome these challenges through our innovative platform. Our solution enables:\n\n• [Key Feature 1] that delivers [Benefit 1]\n• [Key Feature 2] that ensures [Benefit 2]\n• [Key Feature 3] that provides [Benefit 3]\n\nI'd love to schedule a brief call to learn more about your specific needs and show you how coffeeHub might be able to help. Would you have 15 minutes available this week?\n\nLooking forward to connecting,\n\n[Your Name]\n[Your Title]\ncoffeeHub\n[Phone Number]\n[Email]",
-                "FollowUpEmail" : "Subject: Following up on CoffeeHub for [Company Name]\n\nDear [Name],\n\nI wanted to follow up on my previous message about how CoffeeHub can help [Company Name] with coffee.\n\nI thought you might find this [case study/article/resource] valuable: [Link]\n\nIt shows how [Company Similar to Prospect] was able to [achieve specific result] after implementing our solution.\n\nI'd still love to schedule a quick call to discuss your specific needs. Would any of these times work for you?\n- [Date/Time Option 1]\n- [Date/Time Option 2]\n- [Date/Time Option 3]\n\nLooking forward to connecting,\n\n[Your Name]\nCoffeeHub"
-
-    
-            }}, 
-            "Calls": {{
-                "Introduction" : "Hi [Name], this is [Your Name] from CoffeeHub. How are you doing today? [Pause for response] Great! The reason I'm calling is that we help businesses overcome challenges with Coffee, and I was wondering if that's something your team is currently dealing with?",
-                "Interested" : "I'd love to learn more about your specific challenges. Could you tell me a bit about how your team currently handles coffee? [Listen and take notes] That's really helpful to understand. Many of our clients faced similar challenges before working with us. What we've developed is a solution that [explain 1-2 key benefits relevant to their pain points].",
-                "CallToAction" : "I'd love to show you a quick demo of how our solution works and discuss how it might fit your specific needs. Would you be available for a 20-minute call later this week? I have openings on [suggest 2-3 specific times].",
-                "ObjectionHandling" : [
-                {{
-                    "objection": "We're already using another solution",
-                    "response": "I understand. Many of our current clients switched from other solutions because of our [unique value proposition]. Would you be open to seeing how we compare to your current solution?"
-
-                }},
-                {{
-                    "objection": "We don't have budget right now",
-                    "response": "I completely understand budget constraints. Our solution actually helps companies save [average savings amount] within the first [timeframe]. Would it make sense to at least explore if those savings could apply to your situation?"
-                }}
-                ]
-            }},
-              
-       }} 
-    
-    """
-
-    messages = [
-        {
-            "role": "system",
-            "content": "You are an artificial intelligence assistant and you need to "
-            "engage in a helpful, detailed, polite conversation with a user.",
-        },
-        {
-            "role": "user",
-            "content": prompt,
-        },
-    ]
+    stream = wants_stream()
+    if stream:
+        return stream_section(write_outreach, idea, stream)
 
     try:
-        print("Starting Outreach Creation...")
-        response = client.chat.completions.create(
-            model="sonar-pro",
-            messages=messages,
-        )
-        print("Outreach complete.")
-        raw_out = response.choices[0].message.content
-        print("ai output", raw_out)
-
-        json_out = json.loads(raw_out)
+        json_out = write_outreach(idea)
         return jsonify(json_out), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/pricing", methods=["POST"])
+def plan_pricing(idea, on_token=None):
+    return ask_sonar("pricing", idea, on_token, fields=lambda: pricing_fields(idea))
+
+
+def pricing_fields(idea):
+    # reuse the market research (cached, in flight, or run now) instead of
+    # having pricing research the same competitors from scratch
+    try:
+        market = research_market(idea)
+    except Exception as e:
+        log("pricing_without_market", level=logging.WARNING, error=str(e))
+        return {}
+    return {"competitors": prompts.competitors_field(market)}
+
+
+@app.route("/pricing", methods=["GET", "POST"])
+@cacheable("pricing")
+@limited("pricing")
 def pricing_strategy():
-    data = request.json
-    idea = data.get("idea")
+    idea = request_idea()
 
     if not idea:
-        return jsonify({"error": str(e)}), 500
-    # call market api first and pass in competitors as parameters into pricing strategy/modify prompt as well
-    prompt = f"""
-        You are an expert consultant for company who's premise is {idea}, and they need to come up with
-        competitive pricing tiers. Select one of the following to be the selected pricing model: 1) Subscription-Based,
-        2) One-Time Price 3)Usage-Based. Select the correct one based on the context for the idea being {idea}.
-
-        After selecting the pricing model set three tiers of pricing, which could be for subscription based and usage based
-        different monthly tiers at different price ranges a low tier, a mid tier, and a high tier, and if a one-time
-        pricing model is selected, then 3 potential price points are selected.
-
-        Afterwards analyze the top 3 competitors in this space and their prices/pricing models and the key differentiator
-        whether that be the product itself or the difference in price. Based off this, generate 3 short and concise key insights.
-
-        Next, based on the generated pricing model, calculate a sample monthly revenue, monthly costs, and monthly profit, as well as
-        how much of the revenue comes from each pricing tier. For the monthly costs you should also have how you should allocate those funds. 
-        You should also come up with some optimization opportunities with a profit-based focus.
-
-        Now using all the information you've collected, return this information in JSON format.
-        ONLY RETURN IN CORRECT JSON FORMAT, INCLUDE NO OTHER TEXT AND NO EXPLANATION. DO NOT PUT INTO MARKDOWN. DO NOT INCLUDE NEWLINES. DO NOT RETURN COMMENTS.
-
-        Example (sample format, adjust data as needed): 
-
-        {{
-        "selected_pricing_model": "{{Subscription-Based}}",
-        "pricing_tiers": {{
-            "Low_Tier": {{
-            "price": "{{29}}",
-            "features": ["{{Up to 3 Users}}", "{{5 Projects}}"]
-            }},
-            "Mid_Tier": {{
-            "price": "{{79}}",
-            "features": ["{{Up to 10 Users}}", "{{20 Projects}}", "{{Adavanced Analytics}}"]
-            }},
-            "High_Tier": {{
-            "price": "{{129}}",
-            "features": ["{{Unlimited Users}}", "{{Unlimited Projects}}", "{{Custom Analytics}}", "{{API Access}}"]
-            }}
-        }},
-        {{
-        "competitor_analysis": [
-            {{
-            "name": "{{Netflix}}",
-            "pricing_model": "{{Subscription-Based}}",
-            "price_points": ["{{20}}", "{{35}}", "{{50}}"],
-            "key_differentiator": "{{Well-known brand name}}"
-            }},
-            {{
-            "name": "{{Dropbox}}",
-            "pricing_model": "{{One-Time Price}}",
-            "price_points": ["{{20}}", "{{null}}", "{{null}}"],
-            "key_differentiator": "{{One-time Price}}"
-            }},
-            {{
-            "name": "{{Youtube}}",
-            "pricing_model": "{{Subscription-Based}}",
-            "price_points": ["{{0}}", "{{80}}", "{{120}}"],
-            "key_differentiator": "{{Creator economy}}"
-            }}
-        ],
-        "key_insights": [
-            "{{Your pricing is positioned in the mid-range of the market, offering a balance of features and affordability.}}",
-            "{{Youtube's freemium model may attract price-sensitive customers, but their paid tiers offer fewer features than yours.}}",
-            "{{Consider adding a free trial or money-back guarantee to reduce the perceived risk for new customers.}}"
-        ],
-        "financial_projection": {{
-            "monthly_revenue": "{{15750}}",
-            "monthly_costs": "{{6300}}",
-            "monthly_profit": "{{9450}}",
-            "profit_margin": "{{60}}, //return in terms of a percentage
-            "revenue_distribution": {{
-            "Low_Tier": "{{150}}", //number of basic users
-            "Mid_Tier": "{{75}}",
-            "High_Tier": "{{25}}"
-            }},
-            "cost_allocation": {{
-                "Infrastructure": "{{2500}}",
-                "Marketing": "{{1500}}",
-                "Customer Support": "{{1200}}",
-                "R&D": "{{700}}",
-                "Miscellaneous": "{{400}}"
-            }}
-        }},
-        "optimization_opportunities" : [
-            "{{Focus marketing efforts on Professional tier for highest ROI}}",
-            "{{Consider a 10% price increase on Enterprise tier to improve margins}}",
-            "{{Implement annual billing discounts to improve cash flow}}",
-            "{{Explore infrastructure cost optimizations to increase overall margins}}
-        ]
-        }}
-        }}
-
-    """
+        return jsonify({"error": "Do you not have any ideas?"}), 400
 
-    messages = [
-        {
-            "role": "system",
-            "content": "You are an artificial intelligence assistant and you need to "
-            "engage in a helpful, detailed, polite conversation with a user.",
-        },
-        {
-            "role": "user",
-            "content": prompt,
-        },
-    ]
+    stream = wants_stream()
+    if stream:
+        return stream_section(plan_pricing, idea, stream)
 
     try:
-        print("Starting Pricing Strategy...")
-        response = client.chat.completions.create(
-            model="sonar-pro",
-            messages=messages,
-        )
-        print("Strategizing complete.")
-        raw_out = response.choices[0].message.content
-        print("ai output", raw_out)
-
-        json_out = json.loads(raw_out)
+        json_out = plan_pricing(idea)
         return jsonify(json_out), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/branding/images", methods=["POST"])
-def branding_images():
-    data = request.json
-    idea = data.get("idea")
+def _generate_branding_images(key, idea, assets):
+    images, errors = generate_images(assets)
+    if not errors:
+        responseCache.set(key, images)
+        remember_idea(idea)
+    return images, errors
+
+
+def _cached_branding_images(key):
+    images = responseCache.peek(key)
+    return None if images is None else (images, {})
 
-    if not idea:
-        return jsonify({"error": "You don't have any ideas?"}), 500
 
+def create_branding_images(idea):
     logoPrompt = f"""
         You are a professional graphic designer. Design a professional logo for a new startup who's concept is
         {idea}. Make the design sleek and minimalistic, don't add non-english text, and only in a clear/readable font and make the colors bold.
@@ -398,121 +855,371 @@ def branding_images():
         {idea}. This header should be professional and sleek with exclusively english text in a clear/readable font
     """
 
-    logo = imageClient.images.generate(
-        model="dall-e-3",
-        prompt=logoPrompt,
-        size="1024x1024",
-        quality="standard",
-        n=1,
-    )
+    assets = {
+        "logo": (logoPrompt, "1024x1024"),
+        "websiteBanner": (websiteBannerPrompt, "1792x1024"),
+        "socialMediaAvatar": (socialMediaAvatarPrompt, "1024x1024"),
+        "emailHeader": (emailHeaderPrompt, "1792x1024"),
+    }
+
+    key = section_key("branding_images", idea)
+    images = responseCache.get(key)
+    errors, similar_to = {}, None
+    if images is None:
+        similar = find_similar("branding_images", idea)
+        if similar is not None:
+            similar_to, images = similar
+    if images is None:
+        images, errors = inflight.do(
+            key,
+            lambda: _generate_branding_images(key, idea, assets),
+            recheck=lambda: _cached_branding_images(key),
+        )
 
-    websiteBanner = imageClient.images.generate(
-        model="dall-e-3",
-        prompt=websiteBannerPrompt,
-        size="1792x1024",
-        quality="standard",
-        n=1,
-    )
+    # each image is its webp copy (or the png without Pillow); every variant is
+    # listed under "assets"
+    urls = {
+        name: variants and (variants.get("webp") or variants["png"])
+        for name, variants in images.items()
+    }
+    result = {**urls, "assets": images, "errors": errors}
+    if similar_to:
+        result["similar_to"] = similar_to
+    return result
 
-    socialMediaAvatar = imageClient.images.generate(
-        model="dall-e-3",
-        prompt=socialMediaAvatarPrompt,
-        size="1024x1024",
-        quality="standard",
-        n=1,
-    )
 
-    emailHeader = imageClient.images.generate(
-        model="dall-e-3",
-        prompt=emailHeaderPrompt,
-        size="1792x1024",
-        quality="standard",
-        n=1,
-    )
+@app.route("/branding/images", methods=["POST"])
+@limited("branding_images")
+def branding_images():
+    data = request.json
+    idea = data.get("idea")
 
-    logo_url = logo.data[0].url
-    website_banner_url = websiteBanner.data[0].url
-    social_media_avatar_url = socialMediaAvatar.data[0].url
-    email_header_url = emailHeader.data[0].url
+    if not idea:
+        return jsonify({"error": "You don't have any ideas?"}), 500
 
-    return jsonify(
-        {
-            "logo": logo_url,
-            "websiteBanner": website_banner_url,
-            "socialMediaAvatar": social_media_avatar_url,
-            "emailHeader": email_header_url,
-        }
-    )
+    # slow/failed images come back as null with the reason under "errors"
+    images = asset_urls(create_branding_images(idea))
+    if not any(images["assets"].values()):
+        return jsonify(images), 502
+    return jsonify(images), 200
 
 
-@app.route("/branding/text", methods=["POST"])
+@app.route("/assets/<name>")
+def asset(name):
+    path = assetStore.path(name)
+    if path is None:
+        abort(404)
+    # a name is the hash of its content, so the file never changes and the name
+    # doubles as its etag
+    response = send_file(path, max_age=ASSET_MAX_AGE, etag=name)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def write_branding_text(idea, on_token=None):
+    return ask_sonar("branding_text", idea, on_token)
+
+
+@app.route("/branding/text", methods=["GET", "POST"])
+@cacheable("branding_text")
+@limited("branding_text")
 def branding_text():
-    data = request.json
-    idea = data.get("idea")
+    idea = request_idea()
 
     if not idea:
-        return jsonify({"error": str(e)}), 500
-
-    prompt = f"""
-        You are an expert brander/marketing professional trying to help a startup with the idea to {idea} develop
-        their brand identity. Based off their idea generate 3 colors to form their brand. Additionally create a sample
-        linkedin post, twitter post, and instagram post in the brand's voice. Additionally generate a tagline for the business
-        card of this company.
-
-        Now using all the information you've collected, return this information in JSON format.
-        ONLY RETURN IN CORRECT JSON FORMAT, INCLUDE NO OTHER TEXT AND NO EXPLANATION. DO NOT PUT INTO MARKDOWN. DO NOT INCLUDE NEWLINES. DO NOT RETURN COMMENTS.
-
-        Example (sample format, adjust data as needed): 
-
-        {{
-        "brand_identity"{{
-            "idea": "civic engagement platform for government updates and representative outreach",
-            "colors": {{
-            "primary": "#1E3A8A",
-            "secondary": "#FBBF24",
-            "accent": "#D97706"
-            }},
-            "tagline": "Empowering Your Voice, Strengthening Democracy",
-            "social_media_posts": {{
-            "linkedin": "🌍 Stay informed, stay connected! We bring you the latest updates on government activities and make it easier than ever to reach out to your representatives. Join the movement for more transparent, engaged democracy! #CivicEngagement #GovernmentUpdates #StayInformed",
-            "twitter": "Your voice matters! Get real-time updates on government policies and contact your representatives in just a few clicks. #CivicEngagement #GovernmentUpdates #MakeYourVoiceHeard",
-            "instagram": "Informed citizens make better decisions! Stay updated on government policies, and take action by connecting directly with your representatives. 🔗 #EmpowerYourVoice #CivicEngagement #GovernmentUpdates"
-            }},
-        }}
-        }}
-    """
+        return jsonify({"error": "Do you not have any ideas?"}), 400
 
-    messages = [
-        {
-            "role": "system",
-            "content": "You are an artificial intelligence assistant and you need to "
-            "engage in a helpful, detailed, polite conversation with a user.",
-        },
-        {
-            "role": "user",
-            "content": prompt,
-        },
-    ]
+    stream = wants_stream()
+    if stream:
+        return stream_section(write_branding_text, idea, stream)
 
     try:
-        print("Starting Branding Text...")
-        response = client.chat.completions.create(
-            model="sonar-pro",
-            messages=messages,
-        )
-        print("Branding complete.")
-        raw_out = response.choices[0].message.content
-        print("ai output", raw_out)
-
-        json_out = json.loads(raw_out)
+        json_out = write_branding_text(idea)
         return jsonify(json_out), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+
+
+# every section of the dashboard, run side by side by /report
+REPORT_SECTIONS = {
+    "market": research_market,
+    "pricing": plan_pricing,
+    "outreach": write_outreach,
+    "branding_text": write_branding_text,
+    "branding_images": create_branding_images,
+}
+REPORT_CONCURRENCY = int(os.environ.get("REPORT_CONCURRENCY", "32"))
+reportExecutor = ThreadPoolExecutor(
+    max_workers=REPORT_CONCURRENCY, thread_name_prefix="report"
+)
+
+
+def run_section(name, idea):
+    started = time.perf_counter()
+    try:
+        data = REPORT_SECTIONS[name](idea)
+        errors = data.get("errors") if name == "branding_images" else None
+        if errors and not any(data["assets"].values()):
+            status = "error"
+        elif errors:
+            status = "partial"
+        else:
+            status = "ok"
+        section = {"status": status, "data": data}
+    except Exception as e:
+        section = {"status": "error", "error": str(e)}
+    section["seconds"] = round(time.perf_counter() - started, 3)
+    return section
+
+
+def run_admitted(name, idea, client=None):
+    # job and batch sections take their units of upstream capacity like any
+    # request, waiting their turn instead of failing when the admission queue is
+    # full. batch sections (client set) are charged against the rate limits here too
+    if is_cached(name, idea):
+        return run_section(name, idea)
+    if client is not None:
+        charge_limits(client, SECTION_COSTS[name])
+    while True:
+        try:
+            release = admission.acquire(SECTION_COSTS[name])
+            break
+        except AdmissionFull as e:
+            time.sleep(e.retry_after)
+    try:
+        return run_section(name, idea)
+    finally:
+        release()
+
+
+def report_request():
+    # (idea, sections, None) or (None, None, error response)
+    data = request.json
+    idea = data.get("idea")
+    sections = requested_sections(data, list(REPORT_SECTIONS))
+
+    if not idea:
+        return None, None, (jsonify({"error": "Do you not have any ideas?"}), 400)
+    if sections is None:
+        return None, None, (jsonify({"error": "sections should be a list of section names"}), 400)
+    unknown = [name for name in sections if name not in REPORT_SECTIONS]
+    if unknown:
+        error = jsonify({"error": f"Unknown sections: {', '.join(unknown)}"})
+        return None, None, (error, 400)
+    return idea, sections, None
+
+
+@app.route("/report", methods=["POST"])
+@limited("report")
+def report():
+    idea, sections, error = report_request()
+    if error:
+        return error
+
+    started = time.perf_counter()
+    futures = {
+        name: submit(reportExecutor, run_section, name, idea) for name in sections
+    }
+    results = {name: future.result() for name, future in futures.items()}
+    log(
+        "report",
+        idea=idea,
+        sections={name: section["status"] for name, section in results.items()},
+        seconds=round(time.perf_counter() - started, 3),
+    )
+
+    status = 200 if any(s["status"] != "error" for s in results.values()) else 502
+    return (
+        jsonify(
+            {
+                "idea": idea,
+                "sections": asset_urls(results),
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+        ),
+        status,
+    )
+
+
+# long generations can also run as background jobs: POST returns a job id at once
+# and the work survives the client hanging up (or this worker restarting)
+jobQueue = JobQueue(
+    os.environ.get(
+        "JOBS_PATH", os.path.join(tempfile.gettempdir(), "launchpad", "jobs.db")
+    ),
+    run_admitted,
+    reportExecutor,
+    workers=int(os.environ.get("JOB_WORKERS", "2")),
+    ttl=float(os.environ.get("JOB_TTL", str(24 * 60 * 60))),
+    lease=float(os.environ.get("JOB_LEASE", "60")),
+)
+
+
+@app.route("/jobs", methods=["POST"])
+@limited("report", admit=False)  # each section is admitted as it runs, see run_admitted
+def submit_job():
+    idea, sections, error = report_request()
+    if error:
+        return error
+
+    job_id = jobQueue.submit(idea, sections)
+    url = f"/jobs/{job_id}"
+    return jsonify({"id": job_id, "status": "queued", "url": url}), 202, {"Location": url}
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = jobQueue.get(job_id)
+    if job is None:
+        return jsonify({"error": "No such job, or it has expired"}), 404
+    return jsonify(asset_urls(job)), 200
+
+
+# /batch runs many ideas on its own pool, so its throughput is set by
+# BATCH_CONCURRENCY (and the admission capacity it shares with everything else)
+# rather than by how many http workers there are
+BATCH_SECTIONS = ["market", "pricing", "outreach", "branding_text"]
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "16"))
+BATCH_MAX_IDEAS = int(os.environ.get("BATCH_MAX_IDEAS", "1000"))
+BATCH_RATE_LIMIT = os.environ.get("BATCH_RATE_LIMIT", "10 per hour")
+batchExecutor = ThreadPoolExecutor(
+    max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch"
+)
+
+
+@app.route("/batch", methods=["POST"])
+@limiter.limit(BATCH_RATE_LIMIT, on_breach=rate_limited)
+def batch():
+    data = request.json
+    ideas = data.get("ideas")
+    sections = requested_sections(data, BATCH_SECTIONS)
+
+    if not isinstance(ideas, list) or not all(isinstance(idea, str) for idea in ideas):
+        return jsonify({"error": "ideas should be a list of strings"}), 400
+    if sections is None:
+        return jsonify({"error": "sections should be a list of section names"}), 400
+    ideas = unique_ideas(ideas)
+    if not ideas:
+        return jsonify({"error": "Do you not have any ideas?"}), 400
+    if len(ideas) > BATCH_MAX_IDEAS:
+        return jsonify({"error": f"At most {BATCH_MAX_IDEAS} ideas per batch"}), 400
+    unknown = [name for name in sections if name not in REPORT_SECTIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown sections: {', '.join(unknown)}"}), 400
+    too_big = [name for name in sections if SECTION_COSTS[name] > LIMIT_UNITS]
+    if too_big:
+        # would wait forever for room in the rate limits, retrying won't help
+        error = f"Sections cost more than the rate limits allow at once: {', '.join(too_big)}"
+        return jsonify({"error": error}), 413
+
+    log("batch", ideas=len(ideas), sections=sections)
+
+    # each section is charged to this client's and the global limit as it starts
+    run = functools.partial(run_admitted, client=get_remote_address())
+
+    # one ndjson line per idea and section as it finishes, then a "done" line
+    def events():
+        for event, payload in run_batch(ideas, sections, run, batchExecutor, is_cached):
+            yield event, asset_urls(payload)
+
+    return ndjson_stream(stream_with_context(events()))
+
+
+@app.route("/cache")
+def cache_stats():
+    return (
+        jsonify(
+            {
+                **responseCache.stats(),
+                "inflight": inflight.stats(),
+                "similar": ideaIndex.stats() if ideaIndex is not None else {"enabled": False},
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/extraction")
+def extraction_stats():
+    return jsonify(jsonExtractor.stats()), 200
+
+
+@app.route("/tokens")
+def token_stats():
+    return jsonify(tokenStats.stats()), 200
 
 
-@app.route("/budgeting")
+def collect_stats():
+    # counters the cache, single-flight and extractor already keep, read at scrape time
+    cache = responseCache.stats()
+    yield "launchpad_cache_lookups_total", {"result": "memory_hit"}, cache["hits"] - cache["disk_hits"]
+    yield "launchpad_cache_lookups_total", {"result": "disk_hit"}, cache["disk_hits"]
+    yield "launchpad_cache_lookups_total", {"result": "miss"}, cache["misses"]
+    flights = inflight.stats()
+    yield "launchpad_singleflight_total", {"role": "leader"}, flights["leaders"]
+    yield "launchpad_singleflight_total", {"role": "follower"}, flights["shared"]
+    yield "launchpad_singleflight_in_flight", {}, flights["in_flight"]
+    for outcome, count in jsonExtractor.stats().items():
+        if outcome != "salvaged":
+            yield "launchpad_json_parse_total", {"outcome": outcome}, count
+    queue = admission.stats()
+    yield "launchpad_admission_in_use", {}, queue["in_use"]
+    yield "launchpad_admission_queued", {}, queue["queued"]
+    if ideaIndex is not None:
+        yield "launchpad_idea_index_size", {}, ideaIndex.stats()["ideas"]
+    yield "launchpad_log_dropped_total", {}, logHandler.dropped
+    for provider in (sonarUpstream, imageUpstream):
+        is_open = provider.breaker.state() != "closed"
+        yield "launchpad_circuit_open", {"provider": provider.name}, int(is_open)
+
+
+metrics.collector(collect_stats)
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# scenarios are simulated locally in a few milliseconds, no model involved
+BUDGET_SCENARIOS = int(os.environ.get("BUDGET_SCENARIOS", "20000"))
+BUDGET_MAX_SCENARIOS = int(os.environ.get("BUDGET_MAX_SCENARIOS", "200000"))
+
+
+@app.route("/budgeting", methods=["POST"])
 def budgeting():
-    return jsonify({"error": "Not implemented yet"}), 500
+    # takes the /pricing answer as "pricing", or the idea to look it up in the cache;
+    # monthly_revenue, cost_allocation, growth, churn, cash, ... in the body override it
+    data = request.get_json(silent=True) or {}
+    pricing = data.get("pricing")
+    idea = data.get("idea")
+    if pricing is None and idea:
+        pricing = responseCache.peek(section_key("pricing", idea))
+        if pricing is None:
+            return jsonify({"error": "No pricing for this idea yet, run /pricing first"}), 404
+    if pricing is not None and not isinstance(pricing, dict):
+        return jsonify({"error": "pricing should be the /pricing response"}), 400
+
+    months = data.get("months", 24)
+    scenarios = data.get("scenarios", BUDGET_SCENARIOS)
+    seed = data.get("seed", 0)
+    if not isinstance(months, int) or not 12 <= months <= 36:
+        return jsonify({"error": "months should be between 12 and 36"}), 400
+    if not isinstance(scenarios, int) or not 1 <= scenarios <= BUDGET_MAX_SCENARIOS:
+        return jsonify({"error": f"scenarios should be between 1 and {BUDGET_MAX_SCENARIOS}"}), 400
+    if not isinstance(seed, int) or seed < 0:
+        return jsonify({"error": "seed should be a non-negative integer"}), 400
+
+    started = time.perf_counter()
+    try:
+        inputs = budget.plan(pricing, data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result = budget.simulate(inputs, months, scenarios, seed)
+    return jsonify(
+        {"inputs": inputs, **result, "seconds": round(time.perf_counter() - started, 4)}
+    ), 200
 
 
 if __name__ == "__main__":
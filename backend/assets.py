@@ -0,0 +1,158 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from logs import log
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow only the original png is stored and served
+    Image = None
+
+ASSET_NAME = re.compile(r"^([0-9a-f]{64})(\.png|\.webp|\.jpg|-thumb\.webp)$")
+# variant -> file name suffix after the digest
+VARIANTS = {"png": ".png", "webp": ".webp", "jpeg": ".jpg", "thumb": "-thumb.webp"}
+_SUFFIXES = {suffix: variant for variant, suffix in VARIANTS.items()}
+
+
+class AssetStore:
+    """Content-addressed image files on local disk.
+
+    Every image is stored once under the sha256 of its bytes, next to a WebP and
+    a JPEG copy and a small WebP thumbnail when Pillow is installed. A file name
+    always refers to the same bytes, so the files can be cached forever.
+
+    Only the png is written on the request path; the copies are encoded on a
+    background thread, or on the first request for one if that comes sooner.
+    With a `ttl`, images older than that are deleted every `interval` seconds,
+    so keep it longer than any cached answer that links to them."""
+
+    def __init__(self, root, thumb_size=512, webp_quality=80, jpeg_quality=85,
+                 ttl=None, interval=60 * 60):
+        self.root = root
+        self.thumb_size = thumb_size
+        self.webp_quality = webp_quality
+        self.jpeg_quality = jpeg_quality
+        self.ttl = ttl
+        self._encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="assets")
+        os.makedirs(root, exist_ok=True)
+        if ttl:
+            threading.Thread(target=self._prune_loop, args=(interval,), name="assets-prune", daemon=True).start()
+
+    def put(self, data):
+        # returns variant -> file name, e.g. {"png": ..., "webp": ..., "thumb": ...}
+        digest = hashlib.sha256(data).hexdigest()
+        self._write(f"{digest}.png", lambda: data)
+        if Image is None:
+            return {"png": f"{digest}.png"}
+        self._encoder.submit(self._encode_variants, digest)
+        return {variant: digest + suffix for variant, suffix in VARIANTS.items()}
+
+    def path(self, name):
+        # None for anything that isn't one of our file names (no ../ tricks)
+        match = ASSET_NAME.match(name)
+        if not match:
+            return None
+        path = os.path.join(self.root, name)
+        variant = _SUFFIXES[match.group(2)]
+        if not os.path.exists(path) and Image is not None and variant != "png":
+            self._make_variants(match.group(1), [variant])  # not encoded in the background yet
+        return path if os.path.exists(path) else None
+
+    def _encode_variants(self, digest):
+        try:
+            self._make_variants(digest)
+        except Exception as e:
+            log("asset_encode_failed", level=logging.ERROR, digest=digest, error=str(e))
+
+    def _make_variants(self, digest, variants=("webp", "jpeg", "thumb")):
+        png = os.path.join(self.root, f"{digest}.png")
+        missing = [v for v in variants if not os.path.exists(os.path.join(self.root, digest + VARIANTS[v]))]
+        if not missing or not os.path.exists(png):
+            return  # done already, or the png was pruned
+        with Image.open(png) as image:
+            image.load()
+            encoders = {
+                "webp": lambda: _encode(image, "WEBP", quality=self.webp_quality, method=4),
+                "jpeg": lambda: _encode(
+                    image.convert("RGB"), "JPEG",
+                    quality=self.jpeg_quality, optimize=True, progressive=True,
+                ),
+                "thumb": lambda: _encode(self._thumbnail(image), "WEBP", quality=self.webp_quality),
+            }
+            for variant in missing:
+                self._write(digest + VARIANTS[variant], encoders[variant])
+
+    def _write(self, name, encode):
+        path = os.path.join(self.root, name)
+        if os.path.exists(path):
+            return  # same name, same bytes
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(encode())
+            os.replace(tmp, path)  # readers never see a half-written file
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _thumbnail(self, image):
+        thumb = image.copy()
+        thumb.thumbnail((self.thumb_size, self.thumb_size))
+        return thumb
+
+    def prune(self):
+        # an image goes with all of its copies once its png is older than ttl;
+        # copies without a png and leftover temp files go too
+        cutoff = time.time() - self.ttl
+        expired = set()
+        entries = []
+        for entry in os.scandir(self.root):
+            match = ASSET_NAME.match(entry.name)
+            try:
+                modified = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if match is None:
+                if entry.name.endswith(".tmp") and modified < cutoff:
+                    _unlink(entry.path)
+                continue
+            entries.append((entry, match.group(1)))
+            if match.group(2) == ".png" and modified < cutoff:
+                expired.add(match.group(1))
+        pngs = {digest for entry, digest in entries if entry.name.endswith(".png")}
+        removed = 0
+        for entry, digest in entries:
+            if digest in expired or digest not in pngs:
+                removed += _unlink(entry.path)
+        return removed
+
+    def _prune_loop(self, interval):
+        while True:
+            try:
+                removed = self.prune()
+                if removed:
+                    log("assets_pruned", files=removed)
+            except OSError as e:
+                log("assets_prune_failed", level=logging.ERROR, error=str(e))
+            time.sleep(interval)
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+def _encode(image, fmt, **options):
+    out = io.BytesIO()
+    image.save(out, fmt, **options)
+    return out.getvalue()
@@ -0,0 +1,114 @@
+"""Run many ideas through the report sections in one go.
+
+    python batch.py ideas.txt --sections market,pricing --url http://127.0.0.1:5000 > results.ndjson
+
+posts the ideas (one per line) to /batch and writes each result line as it
+arrives, with progress on stderr.
+"""
+
+import argparse
+import json
+import sys
+import time
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from cache import normalize_idea
+from logs import submit
+
+
+def unique_ideas(ideas):
+    # drops blanks and repeats that only differ in case/whitespace, keeping order
+    seen, unique = set(), []
+    for idea in ideas:
+        key = normalize_idea(idea)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(idea)
+    return unique
+
+
+def run_batch(ideas, sections, run, executor, cached, keepalive=15):
+    """Yields ("result", {...}) for every idea and section as it finishes,
+    ("ping", {}) while nothing has for `keepalive` seconds, then ("done", {...}).
+
+    Sections cached(section, idea) says are in the response cache are answered
+    straight away; the rest queue on `executor`, so its size (not the number of
+    http workers) sets the throughput. Queued work is cancelled if whoever is
+    reading goes away."""
+    started = time.perf_counter()
+    counts = {"ok": 0, "partial": 0, "error": 0}
+    futures = {}
+
+    def result(idea, section, outcome, from_cache):
+        counts[outcome["status"]] += 1
+        return "result", {"idea": idea, "section": section, "cached": from_cache, **outcome}
+
+    try:
+        for idea in ideas:
+            for section in sections:
+                if cached(section, idea):
+                    yield result(idea, section, run(section, idea), True)
+                else:
+                    futures[submit(executor, run, section, idea)] = (idea, section)
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=keepalive, return_when=FIRST_COMPLETED)
+            if not done:
+                yield "ping", {}
+            for future in done:
+                idea, section = futures[future]
+                yield result(idea, section, future.result(), False)
+
+        yield "done", {
+            "ideas": len(ideas),
+            "sections": sections,
+            **counts,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+    finally:
+        for future in futures:
+            future.cancel()  # only stops the ones that haven't started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a list of ideas through /batch.")
+    parser.add_argument("ideas", help="file with one idea per line (- for stdin)")
+    parser.add_argument("--sections", help="comma separated, default: the server's batch sections")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="backend to send the batch to")
+    parser.add_argument("--out", help="write results here instead of stdout")
+    args = parser.parse_args()
+
+    with (sys.stdin if args.ideas == "-" else open(args.ideas)) as f:
+        ideas = [line.strip() for line in f if line.strip()]
+    body = {"ideas": ideas}
+    if args.sections:
+        body["sections"] = args.sections.split(",")
+
+    req = urllib.request.Request(
+        f"{args.url.rstrip('/')}/batch",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    out = open(args.out, "w") if args.out else sys.stdout
+    finished = 0
+    with urllib.request.urlopen(req, timeout=None) as response, out:
+        for line in response:
+            event = json.loads(line)
+            if event["event"] == "ping":
+                continue
+            out.write(line.decode())
+            out.flush()
+            if event["event"] == "result":
+                finished += 1
+                print(
+                    f"[{finished}] {event['status']:<7} {event['section']:<15} {event['idea'][:60]}",
+                    file=sys.stderr,
+                )
+            elif event["event"] == "done":
+                print(
+                    f"done: {event['ok']} ok, {event['partial']} partial, {event['error']} failed"
+                    f" in {event['seconds']}s",
+                    file=sys.stderr,
+                )
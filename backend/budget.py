@@ -0,0 +1,287 @@
+"""Monte Carlo financial projections for /budgeting.
+
+Starting from the pricing tiers, revenue mix and monthly costs /pricing came up
+with, every scenario draws its own customer growth, churn and cost inflation
+and steps them through the months; the spread of outcomes comes back as
+percentile bands instead of the single made-up numbers in the pricing answer.
+
+    python budget.py --scenarios 10000,50000,200000 --months 12,36
+
+prints how many scenarios per second the engine runs.
+"""
+
+import argparse
+import math
+import re
+import time
+
+import numpy as np
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# per month unless noted; each scenario draws its rates from normal distributions
+# with these means and standard deviations
+DEFAULT_ASSUMPTIONS = {
+    "growth": {"mean": 0.08, "sd": 0.04},  # new customers as a share of current ones
+    "churn": {"mean": 0.04, "sd": 0.015},
+    "cost_inflation": {"mean": 0.03, "sd": 0.02},  # per year
+    "volatility": 0.05,  # month to month noise on revenue
+}
+
+# anything bigger is a typo or an attempt to overflow the float32 arrays
+MAX_AMOUNT = 1e12
+# a month's customer growth factor is capped at this, so 36 months of compounding
+# stays finite whatever the rates drawn; realistic rates never get near it
+MAX_MONTHLY_CHANGE = 2.0
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def amount(value):
+    # "$1,299/mo" -> 1299.0; the model writes numbers as strings more often than not
+    number = None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            number = float(value)
+        except OverflowError:
+            number = math.inf
+    elif isinstance(value, str):
+        match = _NUMBER.search(value.replace(",", ""))
+        if match:
+            number = float(match.group())
+    if number is None:
+        raise ValueError(f"Not a number: {value!r:.40}")
+    if not math.isfinite(number) or abs(number) > MAX_AMOUNT:
+        raise ValueError(f"Out of range: {value!r:.40}")
+    return number
+
+
+def price(tier):
+    # a tier's price: 0 for "Free", None when there isn't a number ("Custom", missing)
+    value = tier.get("price") if isinstance(tier, dict) else tier
+    try:
+        return amount(value)
+    except ValueError:
+        return 0.0 if isinstance(value, str) and "free" in value.lower() else None
+
+
+def _amounts(mapping, name):
+    if not isinstance(mapping, dict):
+        raise ValueError(f"{name} should be an object")
+    return {key: amount(value) for key, value in mapping.items()}
+
+
+def _distribution(value, default, name):
+    if value is None:
+        return dict(default)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = {"mean": value}  # just a mean keeps the default spread
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} should be a number or {{\"mean\": ..., \"sd\": ...}}")
+    dist = {**default, **{key: amount(value[key]) for key in ("mean", "sd") if key in value}}
+    # rates are fractions (0.08 = 8%), a mean of 5 is a typo for 5%
+    if not -1 <= dist["mean"] <= 1:
+        raise ValueError(f"{name} mean should be between -1 and 1")
+    if not 0 <= dist["sd"] <= 1:
+        raise ValueError(f"{name} sd should be between 0 and 1")
+    return dist
+
+
+def plan(pricing, overrides):
+    """Works out the simulation inputs from a /pricing answer, with anything in
+    `overrides` (the request body) taking precedence.
+
+    revenue_distribution is each tier's share of monthly_revenue, the way the
+    pricing tab shows it; without a monthly_revenue it is read as customers per
+    tier and priced with pricing_tiers instead."""
+    projection = (pricing or {}).get("financial_projection") or {}
+    if not isinstance(projection, dict):
+        raise ValueError("financial_projection should be an object")
+
+    def pick(key):
+        for source in (overrides, projection, pricing or {}):
+            if source.get(key) is not None:
+                return source[key]
+        return None
+
+    tiers = pick("pricing_tiers") or {}
+    if not isinstance(tiers, dict):
+        raise ValueError("pricing_tiers should be an object")
+    # only needed to turn customer counts into revenue; otherwise they just give
+    # the customers estimate, so tiers without a usable price are left out of it
+    prices = {name: price(tier) for name, tier in tiers.items()}
+    distribution = _amounts(pick("revenue_distribution") or {}, "revenue_distribution")
+    costs = _amounts(pick("cost_allocation") or {}, "cost_allocation")
+
+    revenue = pick("monthly_revenue")
+    customers = {}
+    if revenue is not None:
+        revenue = amount(revenue)
+        total = sum(distribution.values())
+        for name, share in distribution.items():
+            if total > 0 and prices.get(name):
+                customers[name] = round(revenue * share / total / prices[name], 1)
+    elif distribution:
+        missing = [name for name in distribution if prices.get(name) is None]
+        if missing:
+            raise ValueError(f"No price for tiers: {', '.join(missing)}")
+        customers = dict(distribution)
+        revenue = sum(count * prices[name] for name, count in distribution.items())
+    else:
+        raise ValueError("Need a monthly_revenue or a revenue_distribution")
+
+    monthly_costs = pick("monthly_costs")
+    if costs:
+        monthly_costs = sum(costs.values())  # the allocation is the detailed version
+    elif monthly_costs is not None:
+        monthly_costs = amount(monthly_costs)
+        costs = {"Costs": monthly_costs}
+    else:
+        raise ValueError("Need monthly_costs or a cost_allocation")
+    if max(revenue, monthly_costs) > MAX_AMOUNT:  # sums of amounts can still get there
+        raise ValueError("Monthly revenue and costs are out of range")
+
+    cash = overrides.get("cash")
+    # without a bank balance, assume six months of costs in the bank
+    cash = 6 * monthly_costs if cash is None else amount(cash)
+
+    defaults = DEFAULT_ASSUMPTIONS
+    volatility = amount(overrides.get("volatility", defaults["volatility"]))
+    if not 0 <= volatility <= 1:
+        raise ValueError("volatility should be between 0 and 1")
+    return {
+        "monthly_revenue": revenue,
+        "monthly_costs": monthly_costs,
+        "cash": cash,
+        "prices": prices,
+        "customers": customers,
+        "cost_allocation": costs,
+        "growth": _distribution(overrides.get("growth"), defaults["growth"], "growth"),
+        "churn": _distribution(overrides.get("churn"), defaults["churn"], "churn"),
+        "cost_inflation": _distribution(
+            overrides.get("cost_inflation"), defaults["cost_inflation"], "cost_inflation"
+        ),
+        "volatility": volatility,
+    }
+
+
+def simulate(inputs, months=24, scenarios=20_000, seed=0):
+    """Runs `scenarios` projections of `months` months at once and returns
+    percentile bands per month for revenue, costs, burn and cash, plus the
+    runway and break-even spread.
+
+    Arrays are (months, scenarios) float32, so every month's scenarios sit next
+    to each other in memory for the running sums and the sorts behind the bands."""
+    rng = np.random.default_rng(seed)
+    shape = (1, scenarios)
+
+    def draw(dist, size=shape):
+        values = rng.standard_normal(size, dtype=np.float32)
+        values *= dist["sd"]
+        values += dist["mean"]
+        return values
+
+    # every scenario gets its own rates, fixed for its whole run...
+    growth = draw(inputs["growth"])
+    churn = np.clip(draw(inputs["churn"]), 0.0, 1.0)
+    inflation = draw(inputs["cost_inflation"])
+    # ...plus a bit of noise every month
+    change = draw({"mean": 1.0, "sd": inputs["volatility"]}, (months, scenarios))
+
+    # customers (and with them revenue, the tier mix staying put) compound by
+    # growth - churn each month
+    change += growth - churn
+    np.clip(change, 0.0, MAX_MONTHLY_CHANGE, out=change)
+    revenue = np.cumprod(change, axis=0, out=change)
+    revenue *= inputs["monthly_revenue"]
+
+    month = np.arange(1, months + 1, dtype=np.float32)[:, None]
+    monthly_inflation = np.maximum(1.0 + inflation, 1e-6) ** np.float32(1 / 12)
+    costs = inputs["monthly_costs"] * monthly_inflation**month
+
+    burn = costs - revenue
+    cash = inputs["cash"] - np.cumsum(burn, axis=0)
+
+    # month the money runs out, `months` for scenarios that make it to the end
+    broke = cash < 0
+    runway = np.where(broke.any(axis=0), broke.argmax(axis=0) + 1, months)
+    profitable = burn <= 0
+    break_even = np.where(profitable.any(axis=0), profitable.argmax(axis=0) + 1, months + 1)
+
+    return {
+        "months": months,
+        "scenarios": scenarios,
+        "seed": seed,
+        "percentiles": list(PERCENTILES),
+        "revenue": _bands(revenue),
+        "costs": _bands(costs),
+        "burn": _bands(burn),
+        "cash": _bands(cash),
+        # capped at `months`; survival is the share that still had cash at the end
+        "runway_months": _summary(runway),
+        "survival": round(float(1 - broke[-1].mean()), 4),
+        # month revenue first covers costs, months + 1 if it never does
+        "break_even_month": _summary(break_even),
+        "profitable_at_end": round(float(profitable[-1].mean()), 4),
+    }
+
+
+def _ranks(n):
+    # nearest rank of each percentile among n sorted values; with thousands of
+    # scenarios it's indistinguishable from interpolating and a lot cheaper
+    return [round(p / 100 * (n - 1)) for p in PERCENTILES]
+
+
+def _bands(values):
+    # {"p5": [month 1, month 2, ...], "p25": [...], ...}
+    bands = np.sort(values, axis=1)[:, _ranks(values.shape[1])].T
+    return {f"p{p}": np.round(band.astype(np.float64), 2).tolist() for p, band in zip(PERCENTILES, bands)}
+
+
+def _summary(values):
+    ranked = np.sort(values)[_ranks(len(values))]
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, ranked)}
+
+
+def benchmark(scenario_counts, month_counts, repeat=5):
+    # scenarios per second for the whole request's worth of work, bands included
+    inputs = plan(
+        {
+            "pricing_tiers": {
+                "Low_Tier": {"price": "29"},
+                "Mid_Tier": {"price": "79"},
+                "High_Tier": {"price": "129"},
+            },
+            "financial_projection": {
+                "monthly_revenue": "15750",
+                "revenue_distribution": {"Low_Tier": "30", "Mid_Tier": "45", "High_Tier": "25"},
+                "cost_allocation": {"Infrastructure": "2500", "Marketing": "1500", "Salaries": "9000"},
+            },
+        },
+        {},
+    )
+    print(f"{'scenarios':>10}{'months':>8}{'ms':>9}{'scenarios/s':>14}")
+    for months in month_counts:
+        for scenarios in scenario_counts:
+            simulate(inputs, months, scenarios)  # warm up
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                simulate(inputs, months, scenarios)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            print(f"{scenarios:>10}{months:>8}{best * 1000:>9.1f}{scenarios / best:>14,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /budgeting Monte Carlo engine.")
+    parser.add_argument("--scenarios", default="10000,50000,200000")
+    parser.add_argument("--months", default="12,24,36")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    benchmark(
+        [int(n) for n in args.scenarios.split(",")],
+        [int(n) for n in args.months.split(",")],
+        args.repeat,
+    )
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_idea(idea):
+    # "  Coffee shop   that sells HONEY coffee " -> "coffee shop that sells honey coffee"
+    return re.sub(r"\s+", " ", idea).strip().lower()
+
+
+def cache_key(endpoint, version, model, idea):
+    raw = json.dumps([endpoint, version, model, normalize_idea(idea)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def etag_for(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def json_etag(value):
+    # etag of value as jsonify() sends it (sorted keys, compact, trailing newline),
+    # so a cached answer's etag is known without building the response
+    body = json.dumps(value, sort_keys=True, separators=(",", ":")) + "\n"
+    return etag_for(body.encode("utf-8"))
+
+
+class ResponseCache:
+    """Two tier cache for parsed model output: an in-process LRU with a TTL in
+    front of an optional SQLite file that survives worker restarts."""
+
+    def __init__(self, max_entries=1024, ttl=24 * 60 * 60, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> [expires_at, value, etag or None]
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            value, tier = self._lookup(key)
+            if tier is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if tier == "disk":
+                self.disk_hits += 1
+            return value
+
+    def peek(self, key):
+        # same as get() but leaves the hit/miss counters alone
+        with self._lock:
+            return self._lookup(key)[0]
+
+    def etag(self, key):
+        # etag of the cached answer, worked out the first time it's asked for;
+        # None on a miss. Leaves the counters alone like peek()
+        with self._lock:
+            value, tier = self._lookup(key)
+            if tier is None:
+                return None
+            entry = self._entries.get(key)
+            if entry is None:  # max_entries=0, disk only
+                return json_etag(value)
+            if entry[2] is None:
+                entry[2] = json_etag(value)
+            return entry[2]
+
+    def _lookup(self, key):
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1], "memory"
+            del self._entries[key]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                return value, "disk"
+
+        return None, None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+                self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+                self._db.commit()
+
+    def _remember(self, key, value, expires_at):
+        self._entries[key] = [expires_at, value, None]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "path": self.path,
+            }
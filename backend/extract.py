@@ -0,0 +1,229 @@
+import json
+import math
+import re
+import threading
+
+_BAREWORD = re.compile(r'[^\s{}\[\]:,"]+')
+_FOLLOWS_STRING = re.compile(r'\s*(?:[:,}\]"]|$)')
+_LINE_COMMENT = re.compile(r'\s*,?\s*(//.*)?\s*$')
+# whole escape pairs, so \\n (an escaped backslash, then n) isn't read as \n
+_ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{4}|.)', re.S)
+_VALID_ESCAPES = set('\\"/bfnrt')
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+_LITERALS = {"true": "true", "false": "false", "null": "null",
+             "True": "true", "False": "false", "None": "null"}
+
+
+class ExtractionError(ValueError):
+    pass
+
+
+def _tokens(text):
+    # yields ("p", punctuation), ("s", "quoted string") or ("v", bareword),
+    # skipping whitespace and // or /* */ comments
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif text.startswith("//", i):
+            i = text.find("\n", i)
+            i = n if i == -1 else i
+        elif text.startswith("/*", i):
+            i = text.find("*/", i + 2)
+            i = n if i == -1 else i + 2
+        elif c in "{}[]:,":
+            yield "p", c
+            i += 1
+        elif c == '"':
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == "\\" else 1
+            newline = text.find("\n", i, j)
+            if newline != -1 and (j >= n or _FOLLOWS_STRING.match(text, j + 1) is None):
+                # the closing quote went missing (e.g. "60, //comment): end the
+                # string at the line break instead of swallowing the next key
+                yield "s", '"' + _LINE_COMMENT.sub("", text[i + 1 : newline]) + '"'
+                i = newline
+                continue
+            if j >= n:  # cut off mid-string
+                yield "s", text[i:].rstrip("\\") + '"'
+                return
+            yield "s", text[i : j + 1]
+            i = j + 1
+        else:
+            word = _BAREWORD.match(text, i).group()
+            if "//" in word:
+                word = word[: word.index("//")]
+            yield "v", word
+            i += len(word)
+
+
+def _escape(match):
+    # keeps valid escapes, drops the backslash of invalid ones like \$ or \x
+    pair = match.group(1)
+    return match.group() if pair in _VALID_ESCAPES or len(pair) == 5 else pair
+
+
+def _literal(kind, text):
+    if kind == "s":
+        return _ESCAPE.sub(_escape, text)
+    if text in _LITERALS:
+        return _LITERALS[text]
+    if _NUMBER.fullmatch(text):
+        return text
+    try:
+        number = float(text)
+    except ValueError:
+        return json.dumps(text)  # unquoted word like 4B
+    # NaN/Infinity aren't JSON; +5, .5 and the like are numbers written oddly
+    return json.dumps(number) if math.isfinite(number) else "null"
+
+
+def repair_json(raw):
+    """Rebuild the outermost JSON object in raw model output.
+
+    Skips markdown fences and prose around the object, drops comments and
+    trailing/duplicate commas, adds missing commas between values, quotes bare
+    words, merges the anonymous "{ ... }" blocks the prompt examples contain into
+    their parent, and closes whatever a truncated completion left open."""
+    out, stack = [], []
+    for kind, text in _tokens(raw):
+        if not stack:
+            if out:
+                break
+            if kind == "p" and text == "{":
+                out.append("{")
+                stack.append("{")
+            continue
+
+        value_end = bool(out) and out[-1] not in ("{", "[", ",", ":")
+        # a lone string right after "{" or "," inside an object is a key, so the
+        # next value needs a ":" rather than a ","
+        after_key = (
+            value_end
+            and stack[-1] != "["
+            and out[-1].startswith('"')
+            and out[-2] in ("{", ",")
+        )
+        separator = ":" if after_key else ","
+        if kind == "p" and text in "{[":
+            if text == "{" and stack[-1] != "[" and not after_key and out[-1] != ":":
+                stack.append("merge")
+                continue
+            if value_end:
+                out.append(separator)
+            out.append(text)
+            stack.append(text)
+        elif kind == "p" and text in "}]":
+            top = stack.pop()
+            if top != "merge":
+                _close(out, top)
+            if not stack:
+                break
+        elif text == ",":
+            if value_end:
+                out.append(",")
+        elif text == ":":
+            out.append(":")
+        else:
+            if value_end:
+                out.append(separator)
+            out.append(_literal(kind, text))
+
+    if not out:
+        raise ExtractionError("no JSON object found in model output")
+    while stack:
+        top = stack.pop()
+        if top != "merge":
+            _close(out, top)
+    return "".join(out)
+
+
+def _close(out, opener):
+    if out[-1] == ",":
+        out.pop()
+    if out[-1] == ":":
+        out.append("null")
+    out.append("}" if opener == "{" else "]")
+
+
+def validate(value, schema, path="$"):
+    """Returns a list of problems; a schema is a type, a tuple of types, or a
+    dict of required key -> schema."""
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            return [f"{path} should be an object"]
+        problems = []
+        for key, sub in schema.items():
+            if key not in value:
+                problems.append(f"{path}.{key} is missing")
+            else:
+                problems += validate(value[key], sub, f"{path}.{key}")
+        return problems
+    if not isinstance(value, schema):
+        return [f"{path} has the wrong type"]
+    return []
+
+
+def _null_constant(name):
+    # json.loads takes NaN and Infinity, but jsonify would send them on as invalid JSON
+    return None
+
+
+class JsonExtractor:
+    """Parses model output against a schema, repairing it locally first and
+    with one call to repair() as a last resort. Counts how many paid completions
+    were salvaged that a bare json.loads would have thrown away."""
+
+    def __init__(self):
+        self.clean = 0
+        self.repaired = 0
+        self.repaired_by_model = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def parse(self, raw, schema, repair=None):
+        try:
+            value = json.loads(raw, parse_constant=_null_constant)
+            if not validate(value, schema):
+                self._count("clean")
+                return value
+        except (TypeError, ValueError):
+            pass
+
+        try:
+            value = json.loads(repair_json(raw or ""), strict=False, parse_constant=_null_constant)
+            problems = validate(value, schema)
+        except ValueError as e:
+            problems = [str(e)]
+        if not problems:
+            self._count("repaired")
+            return value
+
+        if repair is not None:
+            try:
+                value = json.loads(repair_json(repair(raw, problems) or ""), strict=False, parse_constant=_null_constant)
+                problems = validate(value, schema)
+            except ValueError as e:
+                problems = [str(e)]
+            if not problems:
+                self._count("repaired_by_model")
+                return value
+
+        self._count("failed")
+        raise ExtractionError("; ".join(problems))
+
+    def _count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clean": self.clean,
+                "repaired": self.repaired,
+                "repaired_by_model": self.repaired_by_model,
+                "failed": self.failed,
+                "salvaged": self.repaired + self.repaired_by_model,
+            }
@@ -0,0 +1,201 @@
+"""Local stand-in for the Perplexity chat-completions and OpenAI images APIs, so
+the backend can be load tested without spending anything.
+
+    python fakeupstream.py --port 8090 --latency 2 --jitter 0.5 --error-rate 0.02
+
+then run the backend with PERPLEXITY_BASE_URL=http://127.0.0.1:8090 and
+OPENAI_BASE_URL=http://127.0.0.1:8090/v1 (loadtest.py does all of this for you).
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# the smallest answers that pass RESPONSE_SCHEMAS in app.py, keyed by a word
+# only that endpoint's prompt contains
+CANNED = {
+    "MarketSize": {
+        "MarketSize": {"value": 4000000000, "unit": "USD"},
+        "MarketSizeGrowingYOYPercent": {"value": 12, "unit": "percent"},
+        "CustomerSegments": [{"segment": "Students", "percentage": 60}],
+        "GeographicDistribution": [{"region": "North America", "percentage": 45}],
+        "MarketTrends": [{"trend": "Remote work", "impact": "High"}],
+        "CompetitiveLandscape": [{"competitor": "Acme", "marketShare": 30}],
+        "SWOT": {"Strengths": ["Cheap"], "Weaknesses": ["New"], "Opportunities": ["Growth"], "Threats": ["Incumbents"]},
+    },
+    "Emails": {
+        "Emails": {"Investors": {"subject": "Hello", "body": "We are raising."}},
+        "Calls": {"Customers": {"script": "Hi, do you have a minute?"}},
+    },
+    "pricing_tiers": {
+        "selected_pricing_model": "Subscription",
+        "pricing_tiers": {"basic": {"price": 9, "features": ["Core"]}},
+        "competitor_analysis": [{"name": "Acme", "price": 12}],
+        "key_insights": ["Price below Acme"],
+        "financial_projection": {"month_1": 1000},
+        "optimization_opportunities": ["Annual plans"],
+    },
+    "brand_identity": {
+        "brand_identity": {
+            "colors": {"primary": "#112233"},
+            "tagline": "Launch faster",
+            "social_media_posts": {"twitter": "We're live!"},
+        }
+    },
+}
+
+
+def malformed(text):
+    # the kind of thing sonar-pro really sends: fenced, commented, trailing comma
+    return "Here is the JSON you asked for:\n```json\n" + text[:-1] + ",  // done\n}\n```"
+
+
+def _png(width, height, rgb):
+    raw = (b"\x00" + bytes(rgb) * width) * height
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+class FakeUpstream(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=1.0, jitter=0.25, error_rate=0.0,
+                 malformed_rate=0.0, image_latency=None, tokens_per_second=200):
+        super().__init__(address, Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.image_latency = latency if image_latency is None else image_latency
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self._images = {}
+        self._colors = itertools.count()
+        self._lock = threading.Lock()
+
+    def delay(self, base):
+        time.sleep(max(0.0, random.uniform(base - self.jitter, base + self.jitter)))
+
+    def image(self, size):
+        # a handful of distinct images per size so the asset store has real work
+        color = next(self._colors) % 8
+        with self._lock:
+            if (size, color) not in self._images:
+                width, height = (int(n) for n in size.split("x"))
+                rgb = (32 * color, 255 - 32 * color, 128)
+                self._images[size, color] = base64.b64encode(_png(width, height, rgb)).decode()
+            return self._images[size, color]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real apis
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        server = self.server
+        with server._lock:
+            server.requests += 1
+
+        if random.random() < server.error_rate:
+            server.delay(server.latency / 4)
+            status = random.choice((429, 500, 503))
+            return self._json(status, {"error": {"message": "fake upstream error"}}, {"Retry-After": "0"})
+
+        if self.path.endswith("/chat/completions"):
+            return self._chat(body)
+        if self.path.endswith("/images/generations"):
+            server.delay(server.image_latency)
+            return self._json(200, {"created": int(time.time()), "data": [{"b64_json": server.image(body.get("size", "1024x1024"))}]})
+        self._json(404, {"error": {"message": f"no fake for {self.path}"}})
+
+    def _chat(self, body):
+        server = self.server
+        prompt = json.dumps(body.get("messages", []))
+        canned = next((answer for word, answer in CANNED.items() if word in prompt), CANNED["Emails"])
+        text = json.dumps(canned, indent=2)
+        if body.get("model") != "sonar" and random.random() < server.malformed_rate:
+            text = malformed(text)  # the repair call ("sonar") always gets it right
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4, "total_tokens": (len(prompt) + len(text)) // 4}
+        server.delay(server.latency)
+
+        if not body.get("stream"):
+            return self._json(200, {
+                "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+                "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [text[i : i + 16] for i in range(0, len(text), 16)]
+        for i, piece in enumerate(pieces):
+            chunk = {
+                "id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            if i == len(pieces) - 1:
+                chunk["usage"] = usage
+            self._chunk(f"data: {json.dumps(chunk)}\n\n")
+            time.sleep(4 / server.tokens_per_second)  # ~4 tokens per piece
+        self._chunk("data: [DONE]\n\n")
+        self._chunk("")
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def add_arguments(parser):
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per chat completion")
+    parser.add_argument("--jitter", type=float, default=0.25, help="+/- seconds of uniform noise")
+    parser.add_argument("--image-latency", type=float, help="seconds per image (default: --latency)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered 429/5xx")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of completions with broken JSON")
+
+
+def from_arguments(args, port=0):
+    return FakeUpstream(
+        ("127.0.0.1", port),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        image_latency=args.image_latency,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Perplexity/OpenAI server for load tests.")
+    parser.add_argument("--port", type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = from_arguments(args, args.port)
+    print(f"fake upstream on http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()
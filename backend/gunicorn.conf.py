@@ -0,0 +1,15 @@
+import os
+
+# every request spends nearly all of its time waiting on sonar-pro or dall-e, so
+# workers need to juggle many requests at once instead of one per process.
+#   gthread (default): a thread per in-flight request, no extra dependencies
+#   gevent: a greenlet per request (pip install gevent), hundreds per process
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "64"))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "500"))
+
+# generations routinely take longer than gunicorn's 30s default
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
@@ -0,0 +1,92 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE = ("application/json", "text/plain", "text/html")
+
+
+def matching_etag(if_none_match, etag):
+    # the client's tag for our etag, or None. Weak comparison, as If-None-Match
+    # wants, and counting the -gzip/-br copies Compressor tags as the same answer
+    if if_none_match.star_tag:
+        return etag
+    for tag in if_none_match.as_set(include_weak=True):
+        if tag == etag or tag.startswith(etag + "-"):
+            return tag
+    return None
+
+
+class Compressor:
+    """Compresses JSON/text responses for clients that accept it: brotli when
+    the module is installed, gzip otherwise.
+
+    Streams are left alone, as are bodies under `min_size` where the headers
+    would eat the saving. Responses with an etag are compressed once and the
+    result kept (up to `cache_size` of them), since the same answer goes out
+    again and again."""
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5, cache_size=256):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (etag, encoding) -> compressed body
+        self._lock = threading.Lock()
+
+    def encoding(self, accept_encodings):
+        if brotli is not None and accept_encodings["br"]:
+            return "br"
+        if accept_encodings["gzip"]:
+            return "gzip"
+        return None
+
+    def __call__(self, response, accept_encodings):
+        if (
+            response.is_streamed
+            or response.direct_passthrough
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.encoding(accept_encodings)
+        if encoding is None or (response.content_length or 0) < self.min_size:
+            return response
+
+        etag, weak = response.get_etag()
+        body = self._cached(etag, encoding) if etag else None
+        if body is None:
+            body = self._compress(response.get_data(), encoding)
+            if etag:
+                self._remember(etag, encoding, body)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            # a compressed copy is a different representation, so it gets its own tag
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+
+    def _compress(self, data, encoding):
+        if encoding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level)
+
+    def _cached(self, etag, encoding):
+        with self._lock:
+            body = self._cache.get((etag, encoding))
+            if body is not None:
+                self._cache.move_to_end((etag, encoding))
+            return body
+
+    def _remember(self, etag, encoding, body):
+        with self._lock:
+            self._cache[(etag, encoding)] = body
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
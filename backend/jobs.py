@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from logs import log
+
+
+class JobQueue:
+    """Persistent queue of report jobs in SQLite, worked off by a few threads in
+    every process that opens it.
+
+    A worker leases the job it claims and keeps renewing the lease while its
+    sections run, writing each section's result as soon as it finishes. If the
+    process dies the lease runs out and another worker (or this one after a
+    restart) picks the job up again, skipping the sections already done.
+    Finished jobs are kept for `ttl` seconds so clients can come back for them.
+    """
+
+    def __init__(self, path, run_section, executor, workers=2, ttl=24 * 60 * 60, lease=60.0):
+        self.path = path
+        self.run_section = run_section
+        self.executor = executor
+        self.ttl = ttl
+        self.lease = lease
+        self._wakeup = threading.Event()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, idea TEXT NOT NULL, sections TEXT NOT NULL, "
+                "results TEXT NOT NULL DEFAULT '{}', status TEXT NOT NULL, claim TEXT, "
+                "lease_until REAL, created_at REAL NOT NULL, started_at REAL, "
+                "finished_at REAL, expires_at REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"jobs-{i}", daemon=True).start()
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:  # commits, or rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    def submit(self, idea, sections):
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, idea, sections, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, idea, json.dumps(sections), time.time()),
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, idea, sections, results, status, created_at, started_at, finished_at, expires_at "
+                "FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (job_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, idea, sections, results, status, created_at, started_at, finished_at, expires_at = row
+        results = json.loads(results)
+        return {
+            "id": job_id,
+            "idea": idea,
+            "status": status,
+            "sections": results,
+            "pending": [name for name in json.loads(sections) if name not in results],
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "expires_at": expires_at,
+            "seconds": round((finished_at or time.time()) - created_at, 3),
+        }
+
+    def _claim(self):
+        claim = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM jobs WHERE expires_at <= ?", (now,))
+            db.execute(
+                "UPDATE jobs SET status = 'running', claim = ?, lease_until = ?, "
+                "started_at = COALESCE(started_at, ?) WHERE id = ("
+                "SELECT id FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND lease_until < ?) ORDER BY created_at LIMIT 1)",
+                (claim, now + self.lease, now, now),
+            )
+            row = db.execute(
+                "SELECT id, idea, sections, results FROM jobs WHERE claim = ?", (claim,)
+            ).fetchone()
+        return None if row is None else (claim, row[0], row[1], json.loads(row[2]), json.loads(row[3]))
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+                if job is not None:
+                    self._run(*job)
+                    continue
+            except sqlite3.Error as e:
+                log("job_queue_error", level=logging.ERROR, error=str(e))
+            self._wakeup.wait(timeout=5)
+            self._wakeup.clear()
+
+    def _run(self, claim, job_id, idea, sections, results):
+        futures = {
+            self.executor.submit(self.run_section, name, idea): name
+            for name in sections
+            if name not in results
+        }
+        while futures:
+            done, _ = wait(futures, timeout=self.lease / 3, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures.pop(future)] = future.result()
+            if not self._save(claim, job_id, results):
+                return  # lease lost to another worker, it owns the job now
+
+        failed = all(section["status"] == "error" for section in results.values())
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, results = ?, finished_at = ?, expires_at = ?, "
+                "claim = NULL, lease_until = NULL WHERE id = ? AND claim = ?",
+                ("failed" if failed else "done", json.dumps(results), now, now + self.ttl, job_id, claim),
+            )
+
+    def _save(self, claim, job_id, results):
+        # store partial results and renew the lease in one go
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET results = ?, lease_until = ? WHERE id = ? AND claim = ?",
+                (json.dumps(results), time.time() + self.lease, job_id, claim),
+            )
+            return cursor.rowcount == 1
@@ -0,0 +1,263 @@
+"""Load test the backend against fakeupstream.py, without touching the real apis.
+
+    python loadtest.py --configs gthread:2:64,gevent:2:500 --concurrency 8,32,128 --requests 256
+
+For every serving configuration (worker class:workers:threads or connections)
+this starts the fake upstream and a gunicorn with that configuration, drives the
+routes at each concurrency level and prints p50/p95/p99 latency per route, the
+throughput, how busy the worker slots were and the workers' cpu use. --save
+writes the numbers to a file and --compare fails (exit 1) when p95 latency or
+throughput got worse than a saved run by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeupstream
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ROUTES = ["market", "pricing", "outreach", "branding/text", "branding/images"]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_config(config):
+    # "gthread:2:64" -> ("gthread", 2, 64)
+    worker_class, workers, slots = (config.split(":") + ["2", "64"])[:3]
+    return worker_class, int(workers), int(slots)
+
+
+def start_backend(config, upstream_url, port, log):
+    worker_class, workers, slots = parse_config(config)
+    scratch = tempfile.mkdtemp(prefix="loadtest-")
+    env = {
+        # every request comes from this one client; set these to test the limits
+        "CLIENT_RATE_LIMIT": "1000000 per minute",
+        "GLOBAL_RATE_LIMIT": "1000000 per minute",
+        **os.environ,
+        "PERPLEXITY_API_KEY": "fake",
+        "OPENAI_API_KEY": "fake",
+        "PERPLEXITY_BASE_URL": upstream_url,
+        "OPENAI_BASE_URL": upstream_url + "/v1",
+        "GUNICORN_WORKER_CLASS": worker_class,
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_THREADS": str(slots),
+        "GUNICORN_WORKER_CONNECTIONS": str(slots),
+        # a fresh cache, queue and asset store for every run
+        "RESPONSE_CACHE_PATH": "",
+        "SINGLEFLIGHT_DIR": os.path.join(scratch, "inflight"),
+        "JOBS_PATH": os.path.join(scratch, "jobs.db"),
+        "ASSET_DIR": os.path.join(scratch, "assets"),
+        "METRICS_DIR": os.path.join(scratch, "metrics"),
+        "IDEA_INDEX_PATH": os.path.join(scratch, "ideas.json"),
+        # the test ideas only differ by a number; every request should generate
+        "SIMILAR_IDEAS": "0",
+        "METRICS_INTERVAL": "1",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}", "app:app"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=log,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}, see {log.name}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not come up, see {log.name}")
+
+
+def worker_cpu_seconds(master_pid):
+    # user+system time of the gunicorn workers, from /proc (linux only)
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == master_pid:  # ppid
+            total += (int(fields[11]) + int(fields[12])) / ticks  # utime + stime
+    return total
+
+
+def busy_seconds(base_url):
+    # total time spent inside routes, summed over all workers by /metrics
+    text = urllib.request.urlopen(f"{base_url}/metrics", timeout=10).read().decode()
+    total = 0.0
+    for line in text.splitlines():
+        if line.startswith("launchpad_request_seconds_sum") and 'route="/metrics"' not in line:
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+def request(base_url, route, idea):
+    data = json.dumps({"idea": idea}).encode()
+    req = urllib.request.Request(
+        f"{base_url}/{route}", data=data, headers={"Content-Type": "application/json"}
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=600) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = None  # connection refused/reset or timed out
+    return route, status, time.perf_counter() - started
+
+
+def drive(base_url, routes, concurrency, requests, repeat):
+    # unique ideas measure generation; --repeat N cycles N ideas to measure the cache
+    run = time.time_ns()
+
+    def idea(i):
+        return f"Load test idea {i % repeat}" if repeat else f"Load test idea {run}-{i}"
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(
+            pool.map(lambda i: request(base_url, routes[i % len(routes)], idea(i)), range(requests))
+        )
+        wall = time.perf_counter() - started
+    return results, wall
+
+
+def summarize(results, wall, busy, slots, cpu, workers):
+    by_route = {}
+    for route, status, seconds in results:
+        by_route.setdefault(route, []).append((status, seconds))
+    summary = {"routes": {}, "seconds": wall}
+    for route, samples in by_route.items():
+        latencies = [seconds for _, seconds in samples]
+        summary["routes"][route] = {
+            "requests": len(samples),
+            "errors": sum(1 for status, _ in samples if status != 200),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        }
+    summary["throughput"] = len(results) / wall
+    summary["busy"] = busy / (wall * slots)
+    summary["cpu"] = cpu / (wall * workers) if cpu is not None else None
+    return summary
+
+
+def print_summary(config, concurrency, summary):
+    for route, stats in summary["routes"].items():
+        print(
+            f"{config:<18}{concurrency:>6}  {route:<17}{stats['requests']:>6}{stats['errors']:>6}"
+            f"{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}"
+        )
+    cpu = f"{summary['cpu']:.0%}" if summary["cpu"] is not None else "n/a"
+    print(
+        f"{config:<18}{concurrency:>6}  {'all':<17}{summary['throughput']:>8.1f} req/s"
+        f"   slots busy {summary['busy']:.0%}   worker cpu {cpu}"
+    )
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for config, levels in results.items():
+        for concurrency, summary in levels.items():
+            before = baseline.get(config, {}).get(concurrency)
+            if before is None:
+                continue
+            if summary["throughput"] < before["throughput"] * (1 - tolerance):
+                regressions.append(
+                    f"{config} @{concurrency}: throughput {before['throughput']:.1f} -> {summary['throughput']:.1f} req/s"
+                )
+            for route, stats in summary["routes"].items():
+                old = before["routes"].get(route)
+                if old and stats["p95"] > old["p95"] * (1 + tolerance):
+                    regressions.append(
+                        f"{config} @{concurrency} {route}: p95 {old['p95']:.3f}s -> {stats['p95']:.3f}s"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend against a fake upstream.")
+    parser.add_argument("--configs", default="gthread:2:64", help="comma separated worker_class:workers:threads")
+    parser.add_argument("--concurrency", default="8,32", help="comma separated client concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--routes", default=",".join(ROUTES))
+    parser.add_argument("--repeat", type=int, default=0, help="reuse this many ideas (cache hits) instead of unique ones")
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--compare", help="json file from an earlier --save to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/throughput regression")
+    fakeupstream.add_arguments(parser)
+    args = parser.parse_args()
+
+    upstream = fakeupstream.from_arguments(args)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    upstream_url = f"http://127.0.0.1:{upstream.server_address[1]}"
+    routes = args.routes.split(",")
+
+    print(f"{'config':<18}{'conc':>6}  {'route':<17}{'n':>6}{'err':>6}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}")
+    results = {}
+    for config in args.configs.split(","):
+        worker_class, workers, slots = parse_config(config)
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        with tempfile.NamedTemporaryFile("w", prefix="gunicorn-", suffix=".log", delete=False) as log:
+            process = start_backend(config, upstream_url, port, log)
+        try:
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                busy_before = busy_seconds(base_url)
+                cpu_before = worker_cpu_seconds(process.pid) if os.path.isdir("/proc") else None
+                samples, wall = drive(base_url, routes, concurrency, args.requests, args.repeat)
+                time.sleep(1.5)  # let every worker flush its metrics
+                busy = busy_seconds(base_url) - busy_before
+                cpu = worker_cpu_seconds(process.pid) - cpu_before if cpu_before is not None else None
+                summary = summarize(samples, wall, busy, workers * slots, cpu, workers)
+                results.setdefault(config, {})[str(concurrency)] = summary
+                print_summary(config, concurrency, summary)
+        finally:
+            process.terminate()
+            process.wait(timeout=90)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
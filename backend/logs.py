@@ -0,0 +1,105 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+logger = logging.getLogger("launchpad")
+request_id = contextvars.ContextVar("request_id", default=None)
+
+# set by setup_logging()
+_settings = {"max_field": 500, "payload_sample": 0.01, "prompts": False}
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread as they are: no formatting and no
+    blocking on the request path, and records are dropped (and counted) rather
+    than waited on when the writer falls behind."""
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    # one json object per line; string fields longer than max_field are cut
+    # unless the record asks to be kept whole
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        limit = None if getattr(record, "untruncated", False) else _settings["max_field"]
+        for key, value in getattr(record, "fields", {}).items():
+            entry[key] = _truncate(value, limit)
+        if record.exc_info:
+            entry["error"] = _truncate(self.formatException(record.exc_info), limit)
+        return json.dumps(entry, default=str)
+
+
+def _truncate(value, limit):
+    if limit is None:
+        return value
+    if not isinstance(value, str):
+        value = value if isinstance(value, (int, float, bool, type(None))) else json.dumps(value, default=str)
+        if not isinstance(value, str):
+            return value
+    if len(value) <= limit:
+        return value
+    return f"{value[:limit]}... (+{len(value) - limit} chars)"
+
+
+def setup_logging(level="INFO", max_field=500, payload_sample=0.01, prompts=False,
+                  queue_size=10000, stream=None):
+    """Sends the "launchpad" loggers through a bounded queue to a background
+    thread that writes JSON lines to stdout."""
+    _settings.update(max_field=max_field, payload_sample=payload_sample, prompts=prompts)
+    records = queue.Queue(maxsize=queue_size)
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(records, writer)
+    listener.start()
+    atexit.register(listener.stop)  # flushes what's still queued
+
+    handler = _QueueHandler(records)
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return handler
+
+
+def log(event, level=logging.INFO, exc_info=None, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+
+def log_payload(event, payload, **fields):
+    # prompts and model output: every one in full with LOG_PROMPTS on, otherwise
+    # a sample of them, cut to max_field
+    if _settings["prompts"]:
+        logger.info(event, extra={"fields": {**fields, "payload": payload}, "untruncated": True})
+    elif random.random() < _settings["payload_sample"]:
+        log(event, **fields, payload=payload)
+
+
+def submit(executor, fn, *args):
+    # executor.submit() that keeps the request id for logs from the worker thread
+    return executor.submit(contextvars.copy_context().run, fn, *args)
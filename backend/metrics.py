@@ -0,0 +1,244 @@
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from logs import log
+
+try:
+    import fcntl
+except ImportError:  # windows: folding and scrapes may overlap now and then
+    fcntl = None
+
+# seconds; generations take anywhere from one to a few hundred
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format(name, labels, value):
+    if labels:
+        pairs = ",".join(
+            '{}="{}"'.format(
+                key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            )
+            for key, value in labels
+        )
+        name = f"{name}{{{pairs}}}"
+    return f"{name} {value:g}" if isinstance(value, float) else f"{name} {value}"
+
+
+def _copy(value):
+    # histograms are mutated in place, numbers aren't
+    return [value[0][:], value[1], value[2]] if isinstance(value, list) else value
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # gone, or replaced while we were reading it
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metrics:
+    """Counters, gauges and histograms rendered in the Prometheus text format.
+
+    Recording only touches a dict in this process. With a `directory`, every
+    process writes its numbers to <directory>/<pid>.json every `interval`
+    seconds and render() adds up the files of all gunicorn workers. When a
+    worker has died, its counters and histograms are added to aggregate.json
+    and its file is removed (like prometheus_client's mark_process_dead), so
+    nothing is lost when a worker restarts and the files don't pile up; its
+    gauges are dropped."""
+
+    def __init__(self, directory=None, interval=5.0):
+        self.directory = directory
+        self.interval = interval
+        self._families = {}  # name -> (kind, help, buckets)
+        self._values = {}  # (name, labels) -> number, or [bucket counts, sum, count]
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed = False
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            threading.Thread(target=self._flush_loop, name="metrics", daemon=True).start()
+            atexit.register(self.flush)  # keep what a stopping worker counted
+
+    def counter(self, name, help):
+        self._families[name] = ("counter", help, None)
+
+    def gauge(self, name, help):
+        self._families[name] = ("gauge", help, None)
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        self._families[name] = ("histogram", help, tuple(buckets))
+
+    def collector(self, fn):
+        # fn() returns (name, labels, value) samples read from existing stats(),
+        # called at flush/render time instead of on every request
+        self._collectors.append(fn)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[(name, _labels(labels))] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self._families[name][2]
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self._values.get(key)
+            if hist is None:
+                hist = self._values[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = [
+                [name, list(labels), _copy(value)]
+                for (name, labels), value in self._values.items()
+            ]
+        for collect in self._collectors:
+            try:
+                for name, labels, value in collect():
+                    samples.append([name, list(_labels(labels)), value])
+            except Exception as e:
+                log("metrics_collector_failed", level=logging.ERROR, error=str(e))
+        return {"pid": os.getpid(), "samples": samples}
+
+    def flush(self):
+        with self._flush_lock:
+            if not self._flushed:
+                # a file under our pid belongs to a dead worker that had it before
+                # us; fold it before overwriting it (by now the families are known)
+                self._fold(os.getpid())
+                self._flushed = True
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, os.path.join(self.directory, f"{os.getpid()}.json"))
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except OSError as e:
+                log("metrics_flush_failed", level=logging.ERROR, error=str(e))
+
+    @contextmanager
+    def _locked(self, shared=False):
+        # scrapes read the files under a shared lock, folding takes it exclusively,
+        # so a scrape never sees a dead worker both in its file and the aggregate
+        with open(os.path.join(self.directory, "metrics.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+
+    def _fold(self, pid):
+        path = os.path.join(self.directory, f"{pid}.json")
+        aggregate = os.path.join(self.directory, "aggregate.json")
+        with self._locked():
+            dead = _read(path)
+            if dead is None:
+                return  # another worker got to it first
+            totals = {}
+            for snapshot in (_read(aggregate), dead):
+                if snapshot is not None:
+                    self._add(totals, snapshot["samples"], live=False)
+            samples = [
+                [name, list(labels), value]
+                for name, series in totals.items()
+                for labels, value in series.items()
+            ]
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"pid": None, "samples": samples}, f)
+            os.replace(tmp, aggregate)
+            os.unlink(path)
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()  # this worker's numbers are always current
+        for entry in os.listdir(self.directory):
+            pid = entry[: -len(".json")]
+            if entry.endswith(".json") and pid.isdigit() and not _alive(int(pid)):
+                try:
+                    self._fold(int(pid))
+                except OSError as e:
+                    log("metrics_fold_failed", level=logging.ERROR, error=str(e))
+        with self._locked(shared=True):
+            snapshots = [
+                _read(os.path.join(self.directory, entry))
+                for entry in os.listdir(self.directory)
+                if entry.endswith(".json")
+            ]
+        return [snapshot for snapshot in snapshots if snapshot is not None]
+
+    def _add(self, totals, samples, live):
+        # totals is name -> {labels: value}; gauges only count for live workers
+        for name, labels, value in samples:
+            if name not in self._families:
+                continue
+            kind = self._families[name][0]
+            if kind == "gauge" and not live:
+                continue
+            series = totals.setdefault(name, {})
+            labels = tuple(tuple(pair) for pair in labels)
+            if kind == "histogram":
+                hist = series.setdefault(labels, [[0] * len(value[0]), 0.0, 0])
+                hist[0] = [a + b for a, b in zip(hist[0], value[0])]
+                hist[1] += value[1]
+                hist[2] += value[2]
+            else:
+                series[labels] = series.get(labels, 0) + value
+
+    def render(self):
+        totals = {}  # name -> {labels: value}
+        for snapshot in self._snapshots():
+            pid = snapshot["pid"]  # None for aggregate.json
+            live = pid == os.getpid() or (pid is not None and _alive(pid))
+            self._add(totals, snapshot["samples"], live)
+
+        lines = []
+        for name, (kind, help, buckets) in self._families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(totals.get(name, {}).items()):
+                if kind != "histogram":
+                    lines.append(_format(name, labels, value))
+                    continue
+                counts, total, count = value
+                for bound, bucket in zip(buckets, counts):
+                    lines.append(_format(f"{name}_bucket", labels + (("le", f"{bound:g}"),), bucket))
+                lines.append(_format(f"{name}_bucket", labels + (("le", "+Inf"),), count))
+                lines.append(_format(f"{name}_sum", labels, float(total)))
+                lines.append(_format(f"{name}_count", labels, count))
+        return "\n".join(lines) + "\n"
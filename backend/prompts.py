@@ -0,0 +1,472 @@
+import argparse
+import json
+import re
+import statistics
+import threading
+import time
+from string import Template
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:  # rough count instead, close enough for english prompts
+    _ENCODING = None
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+SYSTEM_PROMPT = "You are a concise startup analyst. Answer with a single JSON object and nothing else."
+LEGACY_SYSTEM_PROMPT = (
+    "You are an artificial intelligence assistant and you need to "
+    "engage in a helpful, detailed, polite conversation with a user."
+)
+
+# the idea appears once and the output shape is a compact, valid JSON skeleton
+# (no comments or trailing commas for the model to copy)
+TEMPLATES = {
+    "market": Template(
+        """Startup idea: $idea
+
+Act as a market research analyst for this idea in its target market, using current web data:
+- estimate TAM, SAM and SOM and their year-over-year growth in percent
+- customer segments and geographic distribution, in percent
+- 3 to 5 current or emerging market trends
+- the top competitors with market share, strengths and weaknesses, plus an entry named "Your position" for this startup
+- a SWOT analysis with 4 points per quadrant
+
+Return only JSON shaped like:
+{"MarketSize":{"TAM":"4B","SAM":"3B","SOM":"500M"},"MarketSizeGrowingYOYPercent":{"TAM":20,"SAM":12,"SOM":5},"CustomerSegments":[{"Name":"Small businesses","Percent":42}],"GeographicDistribution":[{"region":"North America","Percent":55}],"MarketTrends":["..."],"CompetitiveLandscape":[{"CompetitorName":"...","MarketSharePercent":40,"Strengths":"...","Weaknesses":"..."}],"SWOT":{"Strengths":["..."],"Weaknesses":["..."],"Opportunities":["..."],"Threats":["..."]}}"""
+    ),
+    "outreach": Template(
+        """Startup idea: $idea
+
+Act as a seasoned sales copywriter for this company. Write, referencing relevant market information:
+- a cold email, an introduction email for a referral, and a follow-up email (each with a subject line and [placeholders])
+- a cold calling script: introduction, what to say if they are interested, a call to action, and 2 to 3 objections with responses
+
+Return only JSON shaped like:
+{"Emails":{"ColdEmailTemplate":"Subject: ...","IntroductionEmail":"Subject: ...","FollowUpEmail":"Subject: ..."},"Calls":{"Introduction":"...","Interested":"...","CallToAction":"...","ObjectionHandling":[{"objection":"...","response":"..."}]}}"""
+    ),
+    "pricing": Template(
+        """Startup idea: $idea
+
+Act as a pricing consultant for this company:
+- pick the pricing model that fits best: Subscription-Based, One-Time Price or Usage-Based
+- set Low, Mid and High tiers (or 3 price points for one-time pricing) with features
+- $competitors, then give 3 short key insights
+- project monthly revenue, costs, profit and margin (percent), customers per tier, and how costs are allocated
+- list profit-focused optimization opportunities
+
+Return only JSON shaped like:
+{"selected_pricing_model":"Subscription-Based","pricing_tiers":{"Low_Tier":{"price":"29","features":["..."]},"Mid_Tier":{"price":"79","features":["..."]},"High_Tier":{"price":"129","features":["..."]}},"competitor_analysis":[{"name":"...","pricing_model":"...","price_points":["20","35","50"],"key_differentiator":"..."}],"key_insights":["..."],"financial_projection":{"monthly_revenue":"15750","monthly_costs":"6300","monthly_profit":"9450","profit_margin":"60","revenue_distribution":{"Low_Tier":"150","Mid_Tier":"75","High_Tier":"25"},"cost_allocation":{"Infrastructure":"2500","Marketing":"1500"}},"optimization_opportunities":["..."]}"""
+    ),
+    "branding_text": Template(
+        """Startup idea: $idea
+
+Act as a brand strategist for this startup. Create 3 brand colors (hex), a business card tagline, and a LinkedIn, Twitter and Instagram post in the brand's voice.
+
+Return only JSON shaped like:
+{"brand_identity":{"idea":"...","colors":{"primary":"#1E3A8A","secondary":"#FBBF24","accent":"#D97706"},"tagline":"...","social_media_posts":{"linkedin":"...","twitter":"...","instagram":"..."}}}"""
+    ),
+}
+
+# the original verbose prompts, kept so `python prompts.py` can compare against them
+LEGACY_TEMPLATES = {
+    "market": Template(
+        """These are all your qualifications, 
+    You are a Market Research Analyst. 
+    Your task is to tell me the estimated market size for my $idea in my target market. Using available data, 
+    make reasonable assumptions about the total addressable market (TAM), serviceable available market (SAM), and 
+    serviceable obtainable market (SOM) of my product/service.
+
+    
+    You are a Trend Forecaster. 
+    Your task is to tell me about any current and emerging market trends for my $idea. 
+    Using industry reports, news articles, and social media conversations, identify at least 3 to 5 
+    trends relevant to my market. Each trend should include its characteristics, potential impact on my business,
+    and examples of companies already practicing this trend.
+
+    You are a Business Analyst. Your task is to conduct a SWOT analysis for my $idea in my target market. 
+    Identify the Strengths, Weaknesses, Opportunities, and Threats for my product/service. 
+    The analysis should be in a standard SWOT matrix format, with bullet points for each section.
+
+    You are a Market Research Analyst. Your task is to analyze the competitive landscape for my $idea
+    in my target market. Tell me about the top 5 competitors in my target market, including their market share, 
+    strengths/weaknesses, pricing strategies, and marketing tactics. Present the information in a table format. 
+
+    Now using all the information you've collected, return this information in JSON format.
+    ONLY RETURN IN CORRECT JSON FORMAT, INCLUDE NO OTHER TEXT AND NO EXPLANATION. DO NOT PUT INTO MARKDOWN. DO NOT INCLUDE NEWLINES. DO NOT RETURN COMMENTS.
+
+    Example (sample format, adjust data as needed): 
+    {
+        "MarketSize": {
+            "TAM": "4B",
+            "SAM": "3B",
+            "SOM": "500M",
+        },
+        "MarketSizeGrowingYOYPercent": {
+            "TAM": 20,
+            "SAM": 12,
+            "SOM": 5,
+        }
+        "CustomerSegments": [
+            {"Name": "Small businesses", "Percent": 42},
+            {"Name": "Enterprise", "Percent": 28},
+            {"Name": "Consumers", "Percent": 30},
+        ],
+        "GeographicDistribution": [
+            {"region": "North America", "Percent": 55}
+            {"region": "Europe", "Percent": 25}
+            {"region": "Asia Pacific", "Percent": 20}
+        ],
+        "MarketTrends": [
+            "Increasing demand for digital solutions",
+            "Shift towards subscription-based models",
+            "Growing focus on sustainability",
+            "Integration of AI and automation"
+        ],
+        "CompetitiveLandscape": [
+            {"CompetitorName": "Competitor A", "MarketSharePercent": 40, "Strengths": "Brand recognition, global presence",
+			"Weaknesses": "Perceived as commercial, less personalized"},
+            {"CompetitorName": "Competitor B", "MarketSharePercent": 20, "Strengths": "Brand recognition, global presence",
+			"Weaknesses": "Perceived as commercial, less personalized"},
+            {"CompetitorName": "Competitor C", "MarketSharePercent": 15, "Strengths": "Brand recognition, global presence",
+			"Weaknesses": "Perceived as commercial, less personalized"},
+            {"CompetitorName": "Your position", "MarketSharePercent": 10, "Strengths": "Brand recognition, global presence",
+			"Weaknesses": "Perceived as commercial, less personalized"}, // THIS IS RESERVED TO COMPARE COMPETITORS WITH OUR STARTUP
+        ],
+        "SWOT": {
+            "Strengths": [
+                "Innovative product offering",
+                "Strong founding team expertise",
+                "Low overhead costs",
+                "Agility and adaptability"
+            ],
+            "Weaknesses": [
+                "Limited initial resources",
+                "Brand awareness challenges",
+                "Unproven business model",
+                "Small customer base"
+            ],
+            "Opportunities": [
+                "Expanding market size",
+                "Strategic partnerships",
+                "International expansion",
+                "New feature development"
+            ],
+            "Threats": [
+                "Established competitors",
+                "Changing regulations",
+                "Economic downturns",
+                "Rapid technological changes"
+            ],
+        }
+    }
+$idea
+"""
+    ),
+    "outreach": Template(
+        """
+        As a seasoned copywriter who specializes in website copy for a company which is $idea , your task is to write email templates for cold outreach 
+        and warm leads/referrals. Additionally you will write out the Cold Calling Script guide for initial phone conversations
+        this will include an Introduction, what to say if they show interest, a call to action and objection handling. Additionally
+        you will create a follow up email template. These emails generally should make reference to relevant market information.
+
+        Return all this info in ONLY JSON FORMAT. ONLY RETURN IN CORRECT JSON FORMAT, INCLUDE NO OTHER TEXT AND NO EXPLANATION. 
+        DO NOT PUT INTO MARKDOWN. DO NOT INCLUDE NEWLINES. DO NOT RETURN COMMENTS.
+
+        Example (sample, adjust values when necessary):
+        {
+            "Emails": {
+                "ColdEmailTemplate" : "Subject: Solve Your Coffee Challenges with CoffeeHub\n\nDear [Recipient Name],\n\nI hope this email finds you well. My name is [Your Name] from fdhsfhHub, and I'm reaching out because I noticed that [Company Name] might be facing challenges with fdhsfh.\n\nAt fdhsfhHub, we've developed a solution that helps businesses like yours:\n• [Benefit 1]\n• [Benefit 2]\n• [Benefit 3]\n\nWe've already helped companies like [Reference Company] achieve [specific result], and I'd love to show you how we could do the same for [Company Name].\n\nWould you be available for a quick 15-minute call next week to discuss how fdhsfhHub could help your team? I'm free on [Date/Time] or [Date/Time].\n\nLooking forward to connecting,\n\n[Your Name]\n[Your Title]\nfdhsfhHub\n[Phone Number]\n[Email]",
+                "IntroductionEmail" : "Subject: Following Up on [Referrer]'s Introduction\n\nDear [Recipient Name],\n\nI hope this email finds you well. [Referrer Name] suggested I reach out to you regarding the coffee challenges your team might be facing.\n\nAt coffeeHub, we specialize in helping businesses like yours overcome these challenges through our innovative platform. Our solution enables:\n\n• [Key Feature 1] that delivers [Benefit 1]\n• [Key Feature 2] that ensures [Benefit 2]\n• [Key Feature 3] that provides [Benefit 3]\n\nI'd love to schedule a brief call to learn more about your specific needs and show you how coffeeHub might be able to help. Would you have 15 minutes available this week?\n\nLooking forward to connecting,\n\n[Your Name]\n[Your Title]\ncoffeeHub\n[Phone Number]\n[Email]",
+                "FollowUpEmail" : "Subject: Following up on CoffeeHub for [Company Name]\n\nDear [Name],\n\nI wanted to follow up on my previous message about how CoffeeHub can help [Company Name] with coffee.\n\nI thought you might find this [case study/article/resource] valuable: [Link]\n\nIt shows how [Company Similar to Prospect] was able to [achieve specific result] after implementing our solution.\n\nI'd still love to schedule a quick call to discuss your specific needs. Would any of these times work for you?\n- [Date/Time Option 1]\n- [Date/Time Option 2]\n- [Date/Time Option 3]\n\nLooking forward to connecting,\n\n[Your Name]\nCoffeeHub"
+
+    
+            }, 
+            "Calls": {
+                "Introduction" : "Hi [Name], this is [Your Name] from CoffeeHub. How are you doing today? [Pause for response] Great! The reason I'm calling is that we help businesses overcome challenges with Coffee, and I was wondering if that's something your team is currently dealing with?",
+                "Interested" : "I'd love to learn more about your specific challenges. Could you tell me a bit about how your team currently handles coffee? [Listen and take notes] That's really helpful to understand. Many of our clients faced similar challenges before working with us. What we've developed is a solution that [explain 1-2 key benefits relevant to their pain points].",
+                "CallToAction" : "I'd love to show you a quick demo of how our solution works and discuss how it might fit your specific needs. Would you be available for a 20-minute call later this week? I have openings on [suggest 2-3 specific times].",
+                "ObjectionHandling" : [
+                {
+                    "objection": "We're already using another solution",
+                    "response": "I understand. Many of our current clients switched from other solutions because of our [unique value proposition]. Would you be open to seeing how we compare to your current solution?"
+
+                },
+                {
+                    "objection": "We don't have budget right now",
+                    "response": "I completely understand budget constraints. Our solution actually helps companies save [average savings amount] within the first [timeframe]. Would it make sense to at least explore if those savings could apply to your situation?"
+                }
+                ]
+            },
+              
+       } 
+    
+    """
+    ),
+    "pricing": Template(
+        """
+        You are an expert consultant for company who's premise is $idea, and they need to come up with
+        competitive pricing tiers. Select one of the following to be the selected pricing model: 1) Subscription-Based,
+        2) One-Time Price 3)Usage-Based. Select the correct one based on the context for the idea being $idea.
+
+        After selecting the pricing model set three tiers of pricing, which could be for subscription based and usage based
+        different monthly tiers at different price ranges a low tier, a mid tier, and a high tier, and if a one-time
+        pricing model is selected, then 3 potential price points are selected.
+
+        Afterwards analyze the top 3 competitors in this space and their prices/pricing models and the key differentiator
+        whether that be the product itself or the difference in price. Based off this, generate 3 short and concise key insights.
+
+        Next, based on the generated pricing model, calculate a sample monthly revenue, monthly costs, and monthly profit, as well as
+        how much of the revenue comes from each pricing tier. For the monthly costs you should also have how you should allocate those funds. 
+        You should also come up with some optimization opportunities with a profit-based focus.
+
+        Now using all the information you've collected, return this information in JSON format.
+        ONLY RETURN IN CORRECT JSON FORMAT, INCLUDE NO OTHER TEXT AND NO EXPLANATION. DO NOT PUT INTO MARKDOWN. DO NOT INCLUDE NEWLINES. DO NOT RETURN COMMENTS.
+
+        Example (sample format, adjust data as needed): 
+
+        {
+        "selected_pricing_model": "{Subscription-Based}",
+        "pricing_tiers": {
+            "Low_Tier": {
+            "price": "{29}",
+            "features": ["{Up to 3 Users}", "{5 Projects}"]
+            },
+            "Mid_Tier": {
+            "price": "{79}",
+            "features": ["{Up to 10 Users}", "{20 Projects}", "{Adavanced Analytics}"]
+            },
+            "High_Tier": {
+            "price": "{129}",
+            "features": ["{Unlimited Users}", "{Unlimited Projects}", "{Custom Analytics}", "{API Access}"]
+            }
+        },
+        {
+        "competitor_analysis": [
+            {
+            "name": "{Netflix}",
+            "pricing_model": "{Subscription-Based}",
+            "price_points": ["{20}", "{35}", "{50}"],
+            "key_differentiator": "{Well-known brand name}"
+            },
+            {
+            "name": "{Dropbox}",
+            "pricing_model": "{One-Time Price}",
+            "price_points": ["{20}", "{null}", "{null}"],
+            "key_differentiator": "{One-time Price}"
+            },
+            {
+            "name": "{Youtube}",
+            "pricing_model": "{Subscription-Based}",
+            "price_points": ["{0}", "{80}", "{120}"],
+            "key_differentiator": "{Creator economy}"
+            }
+        ],
+        "key_insights": [
+            "{Your pricing is positioned in the mid-range of the market, offering a balance of features and affordability.}",
+            "{Youtube's freemium model may attract price-sensitive customers, but their paid tiers offer fewer features than yours.}",
+            "{Consider adding a free trial or money-back guarantee to reduce the perceived risk for new customers.}"
+        ],
+        "financial_projection": {
+            "monthly_revenue": "{15750}",
+            "monthly_costs": "{6300}",
+            "monthly_profit": "{9450}",
+            "profit_margin": "{60}, //return in terms of a percentage
+            "revenue_distribution": {
+            "Low_Tier": "{150}", //number of basic users
+            "Mid_Tier": "{75}",
+            "High_Tier": "{25}"
+            },
+            "cost_allocation": {
+                "Infrastructure": "{2500}",
+                "Marketing": "{1500}",
+                "Customer Support": "{1200}",
+                "R&D": "{700}",
+                "Miscellaneous": "{400}"
+            }
+        },
+        "optimization_opportunities" : [
+            "{Focus marketing efforts on Professional tier for highest ROI}",
+            "{Consider a 10% price increase on Enterprise tier to improve margins}",
+            "{Implement annual billing discounts to improve cash flow}",
+            "{Explore infrastructure cost optimizations to increase overall margins}
+        ]
+        }
+        }
+
+    """
+    ),
+    "branding_text": Template(
+        """
+        You are an expert brander/marketing professional trying to help a startup with the idea to $idea develop
+        their brand identity. Based off their idea generate 3 colors to form their brand. Additionally create a sample
+        linkedin post, twitter post, and instagram post in the brand's voice. Additionally generate a tagline for the business
+        card of this company.
+
+        Now using all the information you've collected, return this information in JSON format.
+        ONLY RETURN IN CORRECT JSON FORMAT, INCLUDE NO OTHER TEXT AND NO EXPLANATION. DO NOT PUT INTO MARKDOWN. DO NOT INCLUDE NEWLINES. DO NOT RETURN COMMENTS.
+
+        Example (sample format, adjust data as needed): 
+
+        {
+        "brand_identity"{
+            "idea": "civic engagement platform for government updates and representative outreach",
+            "colors": {
+            "primary": "#1E3A8A",
+            "secondary": "#FBBF24",
+            "accent": "#D97706"
+            },
+            "tagline": "Empowering Your Voice, Strengthening Democracy",
+            "social_media_posts": {
+            "linkedin": "🌍 Stay informed, stay connected! We bring you the latest updates on government activities and make it easier than ever to reach out to your representatives. Join the movement for more transparent, engaged democracy! #CivicEngagement #GovernmentUpdates #StayInformed",
+            "twitter": "Your voice matters! Get real-time updates on government policies and contact your representatives in just a few clicks. #CivicEngagement #GovernmentUpdates #MakeYourVoiceHeard",
+            "instagram": "Informed citizens make better decisions! Stay updated on government policies, and take action by connecting directly with your representatives. 🔗 #EmpowerYourVoice #CivicEngagement #GovernmentUpdates"
+            },
+        }
+        }
+    """
+    ),
+}
+
+
+# bump whenever a template changes so cached answers from the old one aren't reused
+VERSIONS = {"market": 2, "outreach": 2, "pricing": 3, "branding_text": 2}
+
+
+# filled in when the caller has nothing better, e.g. pricing without a market result
+DEFAULT_FIELDS = {
+    "competitors": "compare the top 3 competitors' pricing models, price points and key differentiators",
+}
+
+
+def competitors_field(market):
+    """Hands pricing the competitors /market already researched so the model
+    doesn't search for them again."""
+    competitors = [
+        {key: c.get(key) for key in ("CompetitorName", "MarketSharePercent", "Strengths", "Weaknesses")}
+        for c in market.get("CompetitiveLandscape", [])
+        if isinstance(c, dict) and c.get("CompetitorName") != "Your position"
+    ][:5]
+    if not competitors:
+        return DEFAULT_FIELDS["competitors"]
+    return (
+        "these competitors come from our market research, don't research them again; "
+        "compare the 3 most relevant ones' pricing models, price points and key differentiators: "
+        + json.dumps(competitors, separators=(",", ":"))
+    )
+
+
+def render(endpoint, idea, **fields):
+    return TEMPLATES[endpoint].substitute(DEFAULT_FIELDS, idea=idea, **fields)
+
+
+def messages(endpoint, idea, **fields):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": render(endpoint, idea, **fields)},
+    ]
+
+
+def legacy_messages(endpoint, idea):
+    return [
+        {"role": "system", "content": LEGACY_SYSTEM_PROMPT},
+        {"role": "user", "content": LEGACY_TEMPLATES[endpoint].substitute(idea=idea)},
+    ]
+
+
+def count_tokens(messages):
+    text = "\n".join(message["content"] for message in messages)
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(_PIECES.findall(text))
+
+
+class TokenStats:
+    """Per-endpoint totals of estimated prompt tokens and the prompt/completion
+    tokens the provider reports in response.usage."""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, estimated, usage=None):
+        with self._lock:
+            totals = self._totals.setdefault(
+                endpoint,
+                {"requests": 0, "estimated_prompt_tokens": 0, "prompt_tokens": 0, "completion_tokens": 0},
+            )
+            totals["requests"] += 1
+            totals["estimated_prompt_tokens"] += estimated
+            if usage is not None:
+                totals["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+                totals["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: dict(totals) for endpoint, totals in self._totals.items()}
+
+
+BENCHMARK_IDEAS = [
+    "Coffee shop that sells honey coffee",
+    "Civic engagement platform for government updates and representative outreach",
+    "Bookkeeping app for freelance designers",
+    "Subscription box for rare houseplants",
+]
+
+
+def _timed_completion(client, model, messages):
+    started = time.perf_counter()
+    first_token, usage = None, None
+    for chunk in client.chat.completions.create(model=model, messages=messages, stream=True):
+        if first_token is None and chunk.choices and chunk.choices[0].delta.content:
+            first_token = time.perf_counter() - started
+        usage = getattr(chunk, "usage", None) or usage
+    return first_token, time.perf_counter() - started, usage
+
+
+def benchmark(client, endpoints, ideas, model="sonar-pro"):
+    """Sends every idea through the legacy and compact template of each endpoint
+    and prints time-to-first-token, latency and token counts side by side."""
+    print(f"{'endpoint':<14}{'templates':<10}{'ttft s':>8}{'total s':>9}{'prompt tok':>12}{'output tok':>12}")
+    for endpoint in endpoints:
+        for style, build in (("legacy", legacy_messages), ("compact", messages)):
+            ttfts, totals, prompt_tokens, output_tokens = [], [], [], []
+            for idea in ideas:
+                built = build(endpoint, idea)
+                ttft, total, usage = _timed_completion(client, model, built)
+                ttfts.append(ttft or total)
+                totals.append(total)
+                prompt_tokens.append(getattr(usage, "prompt_tokens", None) or count_tokens(built))
+                output_tokens.append(getattr(usage, "completion_tokens", None) or 0)
+            print(
+                f"{endpoint:<14}{style:<10}{statistics.mean(ttfts):>8.2f}{statistics.mean(totals):>9.2f}"
+                f"{statistics.mean(prompt_tokens):>12.0f}{statistics.mean(output_tokens):>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the legacy and compact prompt templates.")
+    parser.add_argument("--benchmark", action="store_true", help="call the model (costs tokens) instead of only counting prompt tokens")
+    parser.add_argument("--endpoints", default=",".join(TEMPLATES))
+    parser.add_argument("--ideas", help="file with one idea per line")
+    parser.add_argument("--model", default="sonar-pro")
+    args = parser.parse_args()
+
+    endpoints = args.endpoints.split(",")
+    ideas = BENCHMARK_IDEAS
+    if args.ideas:
+        with open(args.ideas) as f:
+            ideas = [line.strip() for line in f if line.strip()]
+
+    if args.benchmark:
+        from app import client
+
+        benchmark(client, endpoints, ideas, args.model)
+    else:
+        print(f"{'endpoint':<14}{'legacy tok':>12}{'compact tok':>13}{'saved':>8}")
+        for endpoint in endpoints:
+            legacy = statistics.mean(count_tokens(legacy_messages(endpoint, idea)) for idea in ideas)
+            compact = statistics.mean(count_tokens(messages(endpoint, idea)) for idea in ideas)
+            print(f"{endpoint:<14}{legacy:>12.0f}{compact:>13.0f}{1 - compact / legacy:>8.0%}")
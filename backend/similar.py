@@ -0,0 +1,252 @@
+import atexit
+import base64
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+
+from logs import log
+
+try:
+    import fcntl
+except ImportError:  # windows: snapshots just overwrite each other
+    fcntl = None
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "the", "that", "which", "who", "for", "of", "to", "in", "on",
+    "with", "by", "is", "are", "it", "its", "our", "your", "my", "their", "this",
+}
+_SUFFIXES = ("ing", "ers", "ed", "er", "s")
+_MASK = 0xFFFFFFFF
+
+
+def _stem(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"  # deliveries -> delivery
+    if len(word) > 4 and word.endswith(("ses", "xes", "zes", "ches", "shes")):
+        return word[:-2]  # boxes -> box, but coffees -> coffee below
+    if len(word) > 4 and not word.endswith("ss"):
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                return word[: -len(suffix)]
+    return word
+
+
+def canonical(idea):
+    # "Coffee shop selling honey coffee!" and "coffee shop that sells honey
+    # coffee" are both "coffee shop sell honey coffee"
+    words = _WORD.findall(idea.lower())
+    return " ".join(_stem(word) for word in words if word not in _STOPWORDS)
+
+
+def shingles(text):
+    if len(text) <= 3:
+        return {text} if text else set()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class IdeaIndex:
+    """Finds previously answered ideas that are near-duplicates of a new one.
+
+    Ideas are reduced to character trigrams of their stemmed words and
+    summarised by a `num_perm` MinHash signature; locality-sensitive hashing
+    over `bands` bands of it finds candidates without looking at every stored
+    idea, and the share of equal signature values estimates their Jaccard
+    similarity. A high score alone isn't enough, since "produce delivery in
+    Boston" scores 0.9 against "... in Chicago": the two ideas may only differ
+    in words used by at least `common_share` of the stored ideas (and at least
+    `min_common` of them), never in numbers or rarer words. Until the index has
+    seen enough ideas for a word to be common, only rewordings with the same
+    stemmed words match. Everything lives in memory; with a `path` the index is
+    written there every `interval` seconds, merged with what other workers
+    wrote, and loaded back on start."""
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=8, max_ideas=500_000,
+                 path=None, interval=300.0, common_share=0.01, min_common=5):
+        self.threshold = threshold
+        self.common_share = common_share
+        self.min_common = min_common
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_ideas = max_ideas
+        self.path = path
+        self._ideas = []  # id -> idea as first submitted
+        self._keys = []  # id -> canonical form
+        self._signatures = []  # id -> signature bytes as one int, see similar()
+        self._ids = {}  # canonical form -> id, so rewordings aren't stored twice
+        self._known = set()  # ideas as submitted, to skip them cheaply when merging
+        self._counts = Counter()  # word of a canonical form -> ideas using it
+        self._buckets = [{} for _ in range(bands)]  # hash of band bytes -> [ids]
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # loads the last snapshot in the background so workers boot straight away
+            threading.Thread(target=self._snapshot_loop, args=(interval,), name="ideas", daemon=True).start()
+            atexit.register(self.snapshot)
+
+    def signature(self, grams):
+        # one permutation hashing: each trigram is hashed once into one of
+        # num_perm bins keeping the minimum per bin, instead of num_perm hashes
+        # per trigram; empty bins copy the next filled bin to their right (mixed
+        # with the distance) so similar ideas still agree on them
+        n = self.num_perm
+        bins = [None] * n
+        for gram in grams:
+            h = (zlib.crc32(gram.encode()) * 0x9E3779B1) & _MASK
+            i = h % n
+            if bins[i] is None or h < bins[i]:
+                bins[i] = h
+        signature = array("I", bytes(4 * n))
+        for i in range(n):
+            distance = 0
+            while bins[(i + distance) % n] is None:
+                distance += 1
+            signature[i] = (bins[(i + distance) % n] * 31 + distance) & _MASK
+        return signature.tobytes()
+
+    def add(self, idea):
+        key = canonical(idea)
+        with self._lock:
+            if not key or key in self._ids:
+                return
+        signature = self.signature(shingles(key))
+        with self._lock:
+            self._insert(key, idea, signature)
+            self._dirty = True
+
+    def similar(self, idea):
+        # [(stored idea, similarity)] at or above the threshold, best first
+        key = canonical(idea)
+        if not key:
+            return []
+        signature = self.signature(shingles(key))
+        value = int.from_bytes(signature, "little")
+        size = len(signature)
+        with self._lock:
+            candidates = set()
+            for band, bucket in zip(self._bands(signature), self._buckets):
+                candidates.update(bucket.get(band, ()))
+            matches = []
+            needed = self.threshold * self.num_perm
+            words = set(key.split())
+            for candidate in candidates:
+                # xor the whole signatures at once and count the hashes that
+                # came out zero, i.e. agreed; much faster than comparing in a loop
+                diff = (value ^ self._signatures[candidate]).to_bytes(size, "little")
+                agree = array("I", diff).count(0)
+                if agree >= needed and self._same_content(words, self._keys[candidate]):
+                    matches.append((self._ideas[candidate], agree / self.num_perm))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def _same_content(self, words, key):
+        # every word only one of the ideas has must be a common one ("app",
+        # "platform"); a number, place, negation or typo in the difference means
+        # it's a different idea however close the trigrams are
+        common = max(self.min_common, self.common_share * len(self._ideas))
+        for word in words.symmetric_difference(key.split()):
+            if any(char.isdigit() for char in word) or self._counts[word] < common:
+                return False
+        return True
+
+    def _bands(self, signature):
+        width = 4 * self.rows
+        return [hash(signature[i * width : (i + 1) * width]) for i in range(self.bands)]
+
+    def _insert(self, key, idea, signature):
+        if key in self._ids:
+            return
+        if len(self._ideas) >= self.max_ideas:
+            self._evict()
+        idea_id = len(self._ideas)
+        self._ids[key] = idea_id
+        self._known.add(idea)
+        self._ideas.append(idea)
+        self._keys.append(key)
+        self._counts.update(set(key.split()))
+        self._signatures.append(int.from_bytes(signature, "little"))
+        for band, bucket in zip(self._bands(signature), self._buckets):
+            bucket.setdefault(band, []).append(idea_id)
+
+    def _evict(self):
+        # forget the oldest tenth and rebuild; rare enough not to matter
+        keep = len(self._ideas) - self.max_ideas // 10
+        kept = zip(self._keys[-keep:], self._ideas[-keep:], self._signatures[-keep:])
+        self._ideas, self._keys, self._signatures, self._ids, self._known = [], [], [], {}, set()
+        self._counts = Counter()
+        self._buckets = [{} for _ in range(self.bands)]
+        for key, idea, signature in kept:
+            self._insert(key, idea, signature.to_bytes(4 * self.num_perm, "little"))
+
+    def snapshot(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # pick up what other workers stored since we last looked, then write it all
+            self._merge(self._read())
+            with self._lock:
+                data = {
+                    "num_perm": self.num_perm,
+                    "ideas": self._ideas,
+                    "keys": self._keys,
+                    "signatures": base64.b64encode(
+                        b"".join(
+                            signature.to_bytes(4 * self.num_perm, "little")
+                            for signature in self._signatures
+                        )
+                    ).decode(),
+                }
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if data.get("num_perm") != self.num_perm:
+            return []  # signatures from a different configuration
+        flat = base64.b64decode(data["signatures"])
+        size = 4 * self.num_perm
+        return [
+            (key, idea, flat[i * size : (i + 1) * size])
+            for i, (key, idea) in enumerate(zip(data["keys"], data["ideas"]))
+        ]
+
+    def _merge(self, entries):
+        # a chunk at a time so lookups aren't held up while a big snapshot loads
+        for start in range(0, len(entries), 1000):
+            with self._lock:
+                for key, idea, signature in entries[start : start + 1000]:
+                    if idea not in self._known:
+                        self._insert(key, idea, signature)
+
+    def _snapshot_loop(self, interval):
+        self._merge(self._read())
+        while True:
+            time.sleep(interval)
+            try:
+                self.snapshot()
+            except OSError as e:
+                log("idea_index_snapshot_failed", level=logging.ERROR, error=str(e))
+
+    def stats(self):
+        with self._lock:
+            return {"ideas": len(self._ideas), "threshold": self.threshold}
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # windows, coalescing stays per-process
+    fcntl = None
+
+
+def _lock_file(lock_file):
+    # poll instead of blocking in flock() so a gevent worker keeps serving its
+    # other greenlets while this one waits for another process
+    delay = 0.01
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+
+def _acquire(path):
+    # the holder deletes the file before unlocking it (see _release), so a lock
+    # won on a file that has since been replaced is stale: go again on the new one
+    while True:
+        lock_file = open(path, "a")
+        _lock_file(lock_file)
+        try:
+            if os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino:
+                return lock_file
+        except FileNotFoundError:
+            pass
+        lock_file.close()
+
+
+def _release(path, lock_file):
+    # removed while still locked, so lock files don't pile up one per idea and section
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    lock_file.close()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls so N concurrent callers share one
+    upstream request.
+
+    Threads in one worker wait on the leader's result directly. Across gunicorn
+    workers the leader also takes an flock on a per-key file in lock_dir; once it
+    holds the lock it runs recheck() first, so a worker that queued behind
+    another one picks up the result the first worker stored (e.g. in the SQLite
+    response cache) instead of calling upstream again. That only helps when
+    recheck() can see what other workers stored, so leave lock_dir unset when
+    there's no shared cache.
+    """
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.leaders = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, recheck=None):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, recheck)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _run(self, key, fn, recheck):
+        if not self.lock_dir:
+            return fn()
+
+        path = os.path.join(self.lock_dir, f"{key}.lock")
+        lock_file = _acquire(path)
+        try:
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    return result
+            return fn()
+        finally:
+            _release(path, lock_file)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "in_flight": len(self._calls),
+            }
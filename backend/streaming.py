@@ -0,0 +1,76 @@
+import contextvars
+import json
+import queue
+import threading
+
+from flask import Response, request
+
+# a comment/ping is sent while sonar-pro is still searching so proxies don't
+# drop the connection before the first token shows up
+KEEPALIVE_SECONDS = 15
+
+
+def wants_stream():
+    # opt in with ?stream=1 (sse), ?stream=ndjson, or the matching Accept header
+    mode = request.args.get("stream", "").lower()
+    accept = request.headers.get("Accept", "")
+    if mode in ("ndjson", "jsonl") or (
+        not mode and "application/x-ndjson" in accept
+    ):
+        return "ndjson"
+    if mode in ("1", "true", "yes", "sse") or "text/event-stream" in accept:
+        return "sse"
+    return None
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _ndjson(event, payload):
+    return json.dumps({"event": event, **payload}) + "\n"
+
+
+def ndjson_stream(events):
+    # events yields (event, payload) pairs; sent one json object per line
+    return Response(
+        (_ndjson(event, payload) for event, payload in events),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def stream_section(section, idea, mode):
+    """Run section(idea, on_token=...) in the background and stream its tokens,
+    finishing with a "result" event holding the parsed JSON (or an "error").
+
+    The generation keeps going if the client disconnects, so the answer still
+    lands in the response cache."""
+    events = queue.Queue()
+
+    def run():
+        try:
+            result = section(idea, on_token=lambda text: events.put(("token", {"text": text})))
+            events.put(("result", {"data": result}))
+        except Exception as e:
+            events.put(("error", {"error": str(e)}))
+
+    # the copied context keeps the request id on the generation's log lines
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+
+    def generate():
+        while True:
+            try:
+                event, payload = events.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n" if mode == "sse" else _ndjson("ping", {})
+                continue
+            yield _sse(event, payload) if mode == "sse" else _ndjson(event, payload)
+            if event != "token":
+                return
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream" if mode == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,129 @@
+"""Tests for the local JSON repair, so a regression shows up here instead of as
+paid repair calls.
+
+    cd backend && python -m unittest test_extract   (or python -m pytest)
+"""
+
+import json
+import unittest
+
+from extract import ExtractionError, JsonExtractor, repair_json, validate
+
+
+def repaired(raw):
+    return json.loads(repair_json(raw), strict=False)
+
+
+class RepairJsonTest(unittest.TestCase):
+    def test_markdown_fence_and_prose(self):
+        raw = 'Here you go:\n```json\n{"a": 1, "b": [1, 2]}\n```\nHope that helps! {"not": "this"}'
+        self.assertEqual(repaired(raw), {"a": 1, "b": [1, 2]})
+
+    def test_line_and_block_comments(self):
+        raw = '{"a": 1, // the first\n /* a block\n comment */ "b": "http://x.com/y"}'
+        self.assertEqual(repaired(raw), {"a": 1, "b": "http://x.com/y"})
+
+    def test_trailing_and_duplicate_commas(self):
+        self.assertEqual(repaired('{"a": [1, 2,], "b": 3,,}'), {"a": [1, 2], "b": 3})
+
+    def test_missing_commas(self):
+        raw = '{"a": 1\n "b": "x"\n "c": [1 2 "three"]\n "d": {"e": true}}'
+        self.assertEqual(repaired(raw), {"a": 1, "b": "x", "c": [1, 2, "three"], "d": {"e": True}})
+
+    def test_missing_closing_quote_before_comment(self):
+        raw = '{"price": "60, // per month\n "tier": "basic"}'
+        self.assertEqual(repaired(raw), {"price": "60", "tier": "basic"})
+
+    def test_escapes(self):
+        # \\n is an escaped backslash followed by n, not a newline
+        raw = r'{"path": "C:\\new\\table", "line": "a\nb", "quote": "say \"hi\"", "e": "\u00e9"}'
+        self.assertEqual(
+            repaired(raw),
+            {"path": "C:\\new\\table", "line": "a\nb", "quote": 'say "hi"', "e": "\u00e9"},
+        )
+
+    def test_invalid_escapes_lose_their_backslash(self):
+        self.assertEqual(repaired(r'{"price": "\$5", "x": "\x"}'), {"price": "$5", "x": "x"})
+
+    def test_nan_and_infinity_become_null(self):
+        raw = '{"a": NaN, "b": Infinity, "c": -Infinity, "d": +5, "e": .5, "f": 1e3}'
+        out = repair_json(raw)
+        self.assertNotIn("NaN", out)
+        self.assertNotIn("Infinity", out)
+        self.assertEqual(
+            json.loads(out), {"a": None, "b": None, "c": None, "d": 5, "e": 0.5, "f": 1000}
+        )
+
+    def test_bare_words_and_python_literals(self):
+        self.assertEqual(
+            repaired("{Market: 4B, ok: True, off: false, none: None}"),
+            {"Market": "4B", "ok": True, "off": False, "none": None},
+        )
+
+    def test_truncated_output_is_closed(self):
+        self.assertEqual(
+            repaired('{"a": {"b": [1, 2, {"c": "unfinished'),
+            {"a": {"b": [1, 2, {"c": "unfinished"}]}},
+        )
+        self.assertEqual(repaired('{"a": 1, "b":'), {"a": 1, "b": None})
+        self.assertEqual(repaired('{"a": "b\\'), {"a": "b"})
+
+    def test_anonymous_blocks_are_merged_into_their_parent(self):
+        raw = '{"Emails": { {"Intro": "hi"}, {"FollowUp": "again"} }, "Calls": {}}'
+        self.assertEqual(
+            repaired(raw), {"Emails": {"Intro": "hi", "FollowUp": "again"}, "Calls": {}}
+        )
+
+    def test_objects_in_lists_are_kept(self):
+        self.assertEqual(repaired('{"a": [{"b": 1}, {"c": 2}]}'), {"a": [{"b": 1}, {"c": 2}]})
+
+    def test_no_object(self):
+        with self.assertRaises(ExtractionError):
+            repair_json("Sorry, I can't help with that.")
+
+
+class ValidateTest(unittest.TestCase):
+    def test_problems(self):
+        schema = {"a": dict, "b": {"c": list}}
+        self.assertEqual(validate({"a": {}, "b": {"c": []}}, schema), [])
+        self.assertEqual(
+            validate({"a": [], "b": {}}, schema),
+            ["$.a has the wrong type", "$.b.c is missing"],
+        )
+
+
+class JsonExtractorTest(unittest.TestCase):
+    schema = {"a": int}
+
+    def test_clean_output_is_parsed_as_is(self):
+        extractor = JsonExtractor()
+        self.assertEqual(extractor.parse('{"a": 1}', self.schema), {"a": 1})
+        self.assertEqual(extractor.stats()["clean"], 1)
+
+    def test_local_repair_comes_before_the_model(self):
+        calls = []
+        extractor = JsonExtractor()
+        value = extractor.parse('```json\n{"a": 1,}\n```', self.schema, repair=lambda *a: calls.append(a))
+        self.assertEqual(value, {"a": 1})
+        self.assertEqual(calls, [])
+        self.assertEqual(extractor.stats()["repaired"], 1)
+
+    def test_nan_is_null_even_when_json_loads_accepts_it(self):
+        extractor = JsonExtractor()
+        self.assertEqual(extractor.parse('{"a": 1, "b": NaN}', self.schema), {"a": 1, "b": None})
+
+    def test_model_repair_as_last_resort(self):
+        extractor = JsonExtractor()
+        value = extractor.parse('{"b": 1}', self.schema, repair=lambda raw, problems: '{"a": 2}')
+        self.assertEqual(value, {"a": 2})
+        self.assertEqual(extractor.stats()["repaired_by_model"], 1)
+
+    def test_failure_raises(self):
+        extractor = JsonExtractor()
+        with self.assertRaises(ExtractionError):
+            extractor.parse("no json here", self.schema)
+        self.assertEqual(extractor.stats()["failed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import email.utils
+import random
+import threading
+import time
+
+import httpx
+import openai
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is degraded, not calling it for {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def http_client(max_connections=100, max_keepalive=20, keepalive_expiry=30):
+    """Shared connection pool for an OpenAI client, so workers reuse warm TLS
+    connections instead of opening one per request."""
+    return openai.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+
+
+def request_timeout(read, connect=5.0):
+    return httpx.Timeout(read, connect=connect)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and rejects calls for
+    `cooldown` seconds, then lets a single trial call through (half-open)."""
+
+    def __init__(self, name, threshold=5, cooldown=30.0):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self._trial:
+                raise CircuitOpenError(self.name, max(remaining, 1))
+            self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self._trial else "open"
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(value)  # HTTP-date form
+            return max(when.timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _outcome(error):
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.APIStatusError):
+        return str(error.status_code)
+    return "error"
+
+
+def _failed(error):
+    # the provider's fault (counts against the breaker) rather than our request's
+    if isinstance(error, openai.APIConnectionError):  # includes timeouts
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _retryable(error):
+    # a read timeout isn't retried: the provider may still be generating (and
+    # billing) the first attempt, and the caller has given up waiting on it anyway
+    if isinstance(error, openai.APITimeoutError):
+        return isinstance(error.__cause__, httpx.ConnectTimeout)
+    return _failed(error)
+
+
+class Upstream:
+    """Calls into one provider with jittered exponential backoff on 429/5xx and
+    connection errors (honouring Retry-After) behind a circuit breaker. Read
+    timeouts count against the breaker but are raised straight away."""
+
+    def __init__(self, name, max_retries=2, base_delay=0.5, max_delay=8.0,
+                 max_retry_after=30.0, breaker=None, observe=None):
+        self.name = name
+        # observe(provider, model, seconds, outcome) is told about every attempt
+        self.observe = observe
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.breaker = breaker or CircuitBreaker(name)
+
+    def call(self, fn, **kwargs):
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            started = time.perf_counter()
+            try:
+                result = fn(**kwargs)
+            except Exception as e:
+                self._observe(kwargs, started, _outcome(e))
+                if not _failed(e):
+                    # our request was bad, the provider is fine
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if not _retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self._delay(attempt, _retry_after(e))
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._observe(kwargs, started, "ok")
+            self.breaker.record_success()
+            return result
+
+    def _observe(self, kwargs, started, outcome):
+        if self.observe is not None:
+            seconds = time.perf_counter() - started
+            self.observe(self.name, kwargs.get("model"), seconds, outcome)
+
+    def _delay(self, attempt, retry_after):
+        if retry_after is not None:
+            # a provider asking us to wait longer than this is degraded, fail fast
+            return retry_after if retry_after <= self.max_retry_after else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
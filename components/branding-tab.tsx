@@ -100,13 +100,7 @@ export function BrandingTab({ name, startupIdea, demo }: BrandingTabProps) {
 			let data = await res.json();
 			setImageData(data);
 
-			res = await fetch('http://127.0.0.1:5000/branding/text', {
-				method: 'POST',
-				headers: {
-					'Content-Type': 'application/json',
-				},
-				body: JSON.stringify({ idea: startupIdea }),
-			});
+			res = await fetch(`http://127.0.0.1:5000/branding/text?idea=${encodeURIComponent(startupIdea)}`);
 			data = await res.json();
 			setTextData(data);
 		})();
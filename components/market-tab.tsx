@@ -167,13 +167,8 @@ export function MarketTab({ startupIdea, demo }: MarketTabProps) {
 			if (!startupIdea || demo) return;
 			console.log(`Market Analysis for ${startupIdea}`);
 
-			const res = await fetch('http://127.0.0.1:5000/market', {
-				method: 'POST',
-				headers: {
-					'Content-Type': 'application/json',
-				},
-				body: JSON.stringify({ idea: startupIdea }),
-			});
+			// GET so the browser can reuse the answer and revalidate it with its ETag
+			const res = await fetch(`http://127.0.0.1:5000/market?idea=${encodeURIComponent(startupIdea)}`);
 			const data = await res.json();
 			setData(data);
 		})();
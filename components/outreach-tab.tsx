@@ -66,13 +66,7 @@ export function OutreachTab({ startupIdea, demo }: OutreachTabProps) {
 			if (!startupIdea || demo) return;
 			console.log(`Outreach Generation for ${startupIdea}`);
 
-			const res = await fetch('http://127.0.0.1:5000/outreach', {
-				method: 'POST',
-				headers: {
-					'Content-Type': 'application/json',
-				},
-				body: JSON.stringify({ idea: startupIdea }),
-			});
+			const res = await fetch(`http://127.0.0.1:5000/outreach?idea=${encodeURIComponent(startupIdea)}`);
 			const data = await res.json();
 			setData(data);
 		})();
@@ -153,13 +153,7 @@ export function PricingTab({ startupIdea, demo }: PricingTabProps) {
 			if (!startupIdea || demo) return;
 			console.log(`Pricing Strategy for ${startupIdea}`);
 
-			const res = await fetch('http://127.0.0.1:5000/pricing', {
-				method: 'POST',
-				headers: {
-					'Content-Type': 'application/json',
-				},
-				body: JSON.stringify({ idea: startupIdea }),
-			});
+			const res = await fetch(`http://127.0.0.1:5000/pricing?idea=${encodeURIComponent(startupIdea)}`);
 			const data = await res.json();
 			setData(data);
 		})();